@@ -0,0 +1,19 @@
+"""
+Micro-benchmarks for the bcspec device clients, run against local stand-in servers.
+Usage example:
+  python -m azcam_bcspec.benchmarks.recv
+"""
+
+import statistics
+
+
+def percentiles(times):
+    """
+    Returns p50 and p99 of a list of times.
+    """
+
+    times = sorted(times)
+    p50 = statistics.median(times)
+    p99 = times[min(len(times) - 1, int(round(0.99 * (len(times) - 1))))]
+
+    return p50, p99
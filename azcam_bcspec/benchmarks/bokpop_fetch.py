@@ -0,0 +1,93 @@
+"""
+Measure BokData get_header_data() + makeHeader() wall time and file descriptor use
+against a local BokpopSimulator.
+Usage example:
+  python -m azcam_bcspec.benchmarks.bokpop_fetch -n 2000 --stations 50 --drop-rate 0.01
+"""
+
+import argparse
+import os
+import time
+
+from azcam_bcspec.benchmarks import percentiles
+from azcam_bcspec.instrument_bcspec import BokData
+from azcam_bcspec.simulators.bokpop import BokpopSimulator
+
+
+def count_fds():
+    """
+    Returns the number of open file descriptors of this process, or None if unknown.
+    """
+
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--count", type=int, default=2000, help="header fetches")
+    parser.add_argument("--stations", type=int, default=0, help="extra stations")
+    parser.add_argument("--depth", type=int, default=2, help="station nesting depth")
+    parser.add_argument("--drip", type=int, default=0, help="segment size [bytes]")
+    parser.add_argument(
+        "--drip-delay", type=float, default=0.001, help="delay between segments [s]"
+    )
+    parser.add_argument(
+        "--drop-rate", type=float, default=0.0, help="fraction of dropped replies"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=1.0, help="BokData timeout [s]"
+    )
+    args = parser.parse_args()
+
+    sim = BokpopSimulator(stations=args.stations, depth=args.depth, seed=1)
+    sim.drip = args.drip
+    sim.drip_delay = args.drip_delay
+    sim.drop_rate = args.drop_rate
+    sim.drop_bytes = 100
+    sim.start()
+
+    try:
+        bokdata = BokData(sim.host, sim.port, args.timeout)
+        print(f"payload bytes: {len(sim.reply('all'))}")
+
+        bokdata.makeHeader()  # first connection outside timing
+        fds0 = count_fds()
+
+        times = []
+        errors = 0
+        t0 = time.perf_counter()
+        for _ in range(args.count):
+            t1 = time.perf_counter()
+            try:
+                header = bokdata.makeHeader()
+            except Exception:
+                errors += 1
+                continue
+            times.append(time.perf_counter() - t1)
+        elapsed = time.perf_counter() - t0
+
+        # the simulator runs in this process, let its threads close their connections
+        time.sleep(0.2)
+        fds1 = count_fds()
+
+        p50, p99 = percentiles(times)
+        print(f"keywords: {len(header)}")
+        print(
+            f"fetches: {args.count}, errors: {errors}, dropped by server: {sim.drops}"
+        )
+        print(f"fetch p50 {p50 * 1e3:.3f} ms, p99 {p99 * 1e3:.3f} ms")
+        print(f"fetches/s: {args.count / elapsed:.0f}")
+        if fds0 is not None:
+            print(f"open fds before {fds0}, after {fds1}, growth {fds1 - fds0}")
+        print(f"server connections still open: {sim.open_connections}")
+    finally:
+        sim.stop()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
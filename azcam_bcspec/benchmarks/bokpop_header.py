@@ -0,0 +1,74 @@
+"""
+Compare BokData header extraction with a flattened keyword index against per-keyword extract().
+Payloads come from simulators.bokpop.make_payload with increasing numbers of weather stations.
+Usage example:
+  python -m azcam_bcspec.benchmarks.bokpop_header -n 2000
+"""
+
+import argparse
+import time
+
+from azcam_bcspec.instrument_bcspec import BokData
+from azcam_bcspec.simulators.bokpop import make_payload
+
+
+def legacy_header(bokdata, all_data):
+    """
+    The original makeHeader loop, one recursive extract() per keyword.
+    """
+
+    header = []
+    for kw, fitskw, descr in bokdata.kwmap:
+        val = bokdata.extract(all_data, kw)
+        try:
+            val = float(val)
+        except ValueError:
+            pass
+        except Exception:
+            pass
+        header.append([fitskw, val, '"' + descr + '"'])
+        if fitskw == "LST-OBS":
+            header.append(["ST", val, '"local siderial time"'])
+
+    return header
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-n", "--repeat", type=int, default=2000, help="headers per payload size"
+    )
+    parser.add_argument("--depth", type=int, default=3, help="station nesting depth")
+    args = parser.parse_args()
+
+    bokdata = BokData()
+    bokdata.close()  # no connection needed
+
+    print(
+        f"{'stations':>8} {'keys':>6} {'extract us':>11} {'index us':>9} {'speedup':>8}"
+    )
+    for stations in (0, 10, 50, 200):
+        payload = make_payload(stations, args.depth, seed=stations)
+        assert legacy_header(bokdata, payload) == bokdata.headerFromData(payload)
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            legacy_header(bokdata, payload)
+        legacy = (time.perf_counter() - t0) / args.repeat
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            bokdata.headerFromData(payload)
+        indexed = (time.perf_counter() - t0) / args.repeat
+
+        nkeys = len(bokdata.flatten(payload))
+        print(
+            f"{stations:>8} {nkeys:>6} {legacy * 1e6:>11.1f} {indexed * 1e6:>9.1f} "
+            f"{legacy / indexed:>7.1f}x"
+        )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Compare a pipelined CalibrationSequence with the serial lamp pattern.
+Lamps are commanded through a local Opto22Simulator and exposures are simulated with
+fixed integration, readout and transfer times. All times, including lamp warm-ups, are
+multiplied by --scale so a full afternoon sequence runs in seconds, and frames per hour
+are reported at full scale.
+Usage example:
+  python -m azcam_bcspec.benchmarks.calibrations --scale 0.02
+"""
+
+import argparse
+import time
+
+import azcam
+from azcam.server import setup_server
+from azcam.tools.tools import Tools
+
+from azcam_bcspec.simulators.opto22 import Opto22Simulator
+
+# a typical afternoon calibration sequence, [imagetype, exposure time, frames, lamps]
+STEPS = [
+    ["HE/AR/NE", 30.0, 5],
+    ["FE/NE", 60.0, 3],
+    ["HE/AR/NE", 30.0, 2],
+    ["flat", 5.0, 10, "CONT"],
+    ["zero", 0.0, 5],
+]
+
+
+class SimulatedExposure(Tools):
+    """
+    Exposure tool with the comparison lamp handling of azcam Exposure.begin()
+    and integrate(), sleeping for integration, readout and image transfer.
+    """
+
+    def __init__(self, scale=1.0):
+        super().__init__("exposure", "simulated exposure")
+
+        self.scale = scale
+        self.readout_time = 10.0
+        self.transfer_time = 4.0
+
+        self.image_types = ["zero", "object", "flat", "dark"]
+        self.comp_sequence = 0
+        self.after_integrate = None
+
+    def expose(self, exposure_time=-1, imagetype="", title=""):
+        instrument = azcam.db.tools["instrument"]
+
+        # lowercase as in Exposure.begin()
+        imagetype = imagetype.lower()
+
+        comp = imagetype not in self.image_types
+        if comp:
+            if not self.comp_sequence:
+                instrument.set_comps(imagetype)
+                instrument.comps_on()
+            instrument.comps_delay()
+        else:
+            instrument.set_comps()
+            exposure_time = 0.0 if imagetype == "zero" else exposure_time
+
+        time.sleep(exposure_time * self.scale)
+        if comp and not self.comp_sequence:
+            instrument.comps_off()
+        if self.after_integrate is not None:
+            self.after_integrate()
+
+        time.sleep((self.readout_time + self.transfer_time) * self.scale)
+
+        return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scale", type=float, default=0.02, help="time scale for all delays"
+    )
+    parser.add_argument("--readout", type=float, default=10.0, help="readout [s]")
+    parser.add_argument("--transfer", type=float, default=4.0, help="transfer [s]")
+    args = parser.parse_args()
+
+    setup_server()
+
+    sim = Opto22Simulator()
+    sim.start()
+
+    try:
+        from azcam_bcspec.calibrations import CalibrationSequence
+        from azcam_bcspec.instrument_bcspec import BCSpecInstrument
+
+        instrument = BCSpecInstrument()
+        instrument.Iserver.Host = sim.host
+        instrument.Iserver.Port = sim.port
+        instrument.LampWarmups = {
+            lamp: warmup * args.scale for lamp, warmup in instrument.LampWarmups.items()
+        }
+        instrument.DefaultWarmup = instrument.DefaultWarmup * args.scale
+
+        exposure = SimulatedExposure(args.scale)
+        exposure.readout_time = args.readout
+        exposure.transfer_time = args.transfer
+
+        calibrations = CalibrationSequence()
+
+        print(f"{'mode':<10} {'frames':>6} {'seconds':>8} {'frames/hour':>12}")
+        results = {}
+        for pipeline in [0, 1]:
+            calibrations.pipeline = pipeline
+            commands = sim.commands
+            report = calibrations.run(STEPS)
+            results[pipeline] = report
+            seconds = report["seconds"] / args.scale
+            fph = report["frames_per_hour"] * args.scale
+            mode = "pipelined" if pipeline else "serial"
+            print(
+                f"{mode:<10} {report['frames']:>6} {seconds:>8.1f} {fph:>12.1f}"
+                f"   ({sim.commands - commands} server commands)"
+            )
+
+        serial = results[0]["frames_per_hour"]
+        pipelined = results[1]["frames_per_hour"]
+        estimate = results[1]["serial_estimate_frames_per_hour"]
+        print(
+            f"speedup {pipelined / serial:.2f}x measured, pipelined run's serial estimate "
+            f"{estimate * args.scale:.1f} frames/hour (not measured)"
+        )
+        print(f"lamps on at end: {sim.get_lamps_on()}")
+    finally:
+        sim.stop()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
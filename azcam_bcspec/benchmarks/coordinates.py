@@ -0,0 +1,79 @@
+"""
+Compare the per-call Az/Alt transform of the original BokTCS.move_azalt with BokCoordinates.
+Usage example:
+  python -m azcam_bcspec.benchmarks.coordinates
+"""
+
+import argparse
+import time
+
+import numpy
+from astropy.coordinates import AltAz, EarthLocation, SkyCoord
+from astropy.time import Time
+
+from azcam_bcspec.coordinates_bok import BokCoordinates
+
+
+def legacy_transform(azimuth, altitude, location):
+    """
+    The original move_azalt transform, building time, site, frame and coordinate per call.
+    """
+
+    obstime = Time.now()
+    if location is None:
+        location = EarthLocation.of_site("Kitt Peak")
+    frame = AltAz(obstime=obstime, location=location)
+    target = SkyCoord(azimuth, altitude, unit="deg", frame=frame)
+    coord = target.transform_to("icrs")
+    ra = coord.ra.to_string(sep="", precision=2, pad=True, unit="hourangle")
+    dec = coord.dec.to_string(sep="", precision=1, pad=True, alwayssign=True)
+
+    return ra, dec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", default="1,10,100,1000", help="comma separated grid sizes"
+    )
+    args = parser.parse_args()
+
+    # of_site may need the network, fall back to fixed Bok coordinates if it fails
+    try:
+        t0 = time.perf_counter()
+        EarthLocation.of_site("Kitt Peak")
+        print(f"EarthLocation.of_site: {time.perf_counter() - t0:.3f} s")
+        location = None
+    except Exception as e:
+        print(f"EarthLocation.of_site failed ({e}), legacy path uses fixed location")
+        location = BokCoordinates().location
+
+    coords = BokCoordinates()
+    coords.azalt_to_radec(0.0, 45.0)  # warm up astropy
+
+    rng = numpy.random.default_rng(1)
+    print(f"{'positions':>9} {'per-call s':>11} {'vector s':>9} {'speedup':>8}")
+    for size in [int(x) for x in args.sizes.split(",")]:
+        az = rng.uniform(0.0, 360.0, size)
+        alt = rng.uniform(20.0, 89.0, size)
+
+        # per-call cost is measured on at most 20 positions and scaled
+        ncalls = min(size, 20)
+        t0 = time.perf_counter()
+        for i in range(ncalls):
+            legacy_transform(az[i], alt[i], location)
+        legacy = (time.perf_counter() - t0) / ncalls * size
+
+        coords.frame = None  # include frame construction
+        t0 = time.perf_counter()
+        ra, dec = coords.azalt_to_radec(az, alt)
+        coords.format_radec(ra, dec)
+        vector = time.perf_counter() - t0
+
+        print(f"{size:>9} {legacy:>11.3f} {vector:>9.3f} {legacy / vector:>7.1f}x")
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare BCSpecInstrument.read_header() with the original per-keyword get_keyword() loop.
+The header holds the bokpop keywords from simulators.bokpop.make_payload plus int, float and
+str instrument keywords. The bulk path is timed with one value changed before each read
+(table reused, list rebuilt) and with no changes (cached list).
+Usage example:
+  python -m azcam_bcspec.benchmarks.instrument_header -n 2000
+"""
+
+import argparse
+import time
+
+from azcam.server import setup_server
+
+from azcam_bcspec.instrument_bcspec import BCSpecInstrument, BokData
+from azcam_bcspec.simulators.bokpop import make_payload
+
+
+def legacy_header(instrument):
+    """
+    The original read_header loop, one get_keyword() per keyword.
+    """
+
+    header = []
+    for key in instrument.header.get_keywords():
+        reply = instrument.get_keyword(key)
+        header.append([key, reply[0], reply[1], reply[2]])
+
+    return header
+
+
+def fill_header(instrument, nkeys):
+    """
+    Put bokpop keywords and extra instrument keywords in the header, nkeys in total.
+    """
+
+    instrument.header.delete_all_keywords()
+
+    bokdata = BokData()
+    bokdata.close()  # no connection needed
+    instrument.set_bokpop_header(bokdata.headerFromData(make_payload(10, 3, seed=1)))
+
+    types = ["int", "float", "str"]
+    values = [7, 1.25, "closed"]
+    i = 0
+    while len(instrument.header.get_keywords()) < nkeys:
+        instrument.header.set_keyword(
+            "INST%04d" % i, values[i % 3], "instrument keyword %d" % i, types[i % 3]
+        )
+        i += 1
+
+    return
+
+
+def time_calls(function, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        function()
+
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-n", "--repeat", type=int, default=2000, help="headers per keyword count"
+    )
+    args = parser.parse_args()
+
+    setup_server()
+    instrument = BCSpecInstrument()
+
+    print(
+        f"{'keys':>6} {'get_keyword us':>15} {'bulk us':>8} {'cached us':>10} "
+        f"{'speedup':>8} {'cached':>8}"
+    )
+    for nkeys in (30, 60, 120, 300):
+        fill_header(instrument, nkeys)
+        nkeys = len(instrument.header.get_keywords())
+        assert legacy_header(instrument) == instrument.read_header()
+
+        legacy = time_calls(lambda: legacy_header(instrument), args.repeat)
+
+        counter = [0]
+
+        def changed():
+            counter[0] += 1
+            instrument.header.set_keyword("INST0000", counter[0])
+            instrument.read_header()
+
+        def set_only():
+            counter[0] += 1
+            instrument.header.set_keyword("INST0000", counter[0])
+
+        bulk = time_calls(changed, args.repeat) - time_calls(set_only, args.repeat)
+        cached = time_calls(instrument.read_header, args.repeat)
+
+        print(
+            f"{nkeys:>6} {legacy * 1e6:>15.1f} {bulk * 1e6:>8.1f} {cached * 1e6:>10.1f} "
+            f"{legacy / bulk:>7.1f}x {legacy / cached:>7.1f}x"
+        )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Measure BCSpecInstrument lamp command throughput against a local Opto22Simulator.
+Runs comps_on, comps_off, lamps_off_all and test() and reports commands per second
+and the per-command latency distribution. Lamp states are reset before each operation
+so every repeat sends its commands, rather than only those for lamps which are not
+already in the requested state.
+Usage example:
+  python -m azcam_bcspec.benchmarks.lamps -n 50 --latency 0.002 --jitter 0.002
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import time
+
+from azcam.server import setup_server
+
+from azcam_bcspec.benchmarks import percentiles
+from azcam_bcspec.simulators.opto22 import Opto22Simulator
+
+
+def make_instrument(sim):
+    """
+    Returns an initialized BCSpecInstrument which talks to the simulator.
+    Each command's latency is appended to instrument.command_times.
+    """
+
+    from azcam_bcspec.instrument_bcspec import BCSpecInstrument
+
+    instrument = BCSpecInstrument()
+    instrument.Iserver.Host = sim.host
+    instrument.Iserver.Port = sim.port
+    instrument.initialize()
+
+    instrument.command_times = []
+    command = instrument.command
+
+    def timed_command(Command):
+        t0 = time.perf_counter()
+        reply = command(Command)
+        instrument.command_times.append(time.perf_counter() - t0)
+        return reply
+
+    instrument.command = timed_command
+
+    return instrument
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-n", "--count", type=int, default=50, help="repeats per operation"
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="reply latency [s]")
+    parser.add_argument("--jitter", type=float, default=0.0, help="reply jitter [s]")
+    parser.add_argument(
+        "--comps", default="HE/AR/NE,FE/NE", help="comma separated active comps"
+    )
+    args = parser.parse_args()
+
+    setup_server()
+
+    sim = Opto22Simulator()
+    sim.latency = args.latency
+    sim.jitter = args.jitter
+    sim.start()
+
+    try:
+        instrument = make_instrument(sim)
+        instrument.set_active_comps(args.comps.split(","))
+
+        operations = [
+            ["comps_on", instrument.comps_on],
+            ["comps_off", instrument.comps_off],
+            ["lamps_off_all", instrument.lamps_off_all],
+            ["test", lambda: instrument.test(0)],
+        ]
+
+        print(f"active comps: {' '.join(instrument.get_active_comps())}")
+        print(
+            f"{'operation':<14} {'cmds/op':>8} {'cmds/s':>8} {'op p50 ms':>10} "
+            f"{'cmd p50 ms':>11} {'cmd p99 ms':>11}"
+        )
+        for name, operation in operations:
+            instrument.command_times = []
+            optimes = []
+            commands = sim.commands
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(args.count):
+                    instrument.reset_lamp_states()
+                    t1 = time.perf_counter()
+                    operation()
+                    optimes.append(time.perf_counter() - t1)
+            elapsed = time.perf_counter() - t0
+
+            # test() changes the active comps
+            instrument.set_active_comps(args.comps.split(","))
+
+            # server commands include the CLIENTDONE handshake
+            commands = sim.commands - commands
+            p50, p99 = percentiles(instrument.command_times)
+            print(
+                f"{name:<14} {commands / args.count:>8.1f} {commands / elapsed:>8.0f} "
+                f"{statistics.median(optimes) * 1e3:>10.2f} "
+                f"{p50 * 1e3:>11.3f} {p99 * 1e3:>11.3f}"
+            )
+        print(f"lamps on at end: {sim.get_lamps_on()}")
+    finally:
+        sim.stop()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
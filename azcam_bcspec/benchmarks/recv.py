@@ -0,0 +1,90 @@
+"""
+Compare the buffered InstrumentServerInterface.recv with the original byte-at-a-time read.
+Replies are read from a local Opto22Simulator in one session.
+Usage example:
+  python -m azcam_bcspec.benchmarks.recv -n 2000
+"""
+
+import argparse
+import time
+
+from azcam_bcspec.instrument_bcspec import InstrumentServerInterface
+from azcam_bcspec.simulators.opto22 import Opto22Simulator
+
+
+class LegacyInstrumentServerInterface(InstrumentServerInterface):
+    """
+    InstrumentServerInterface with the original one byte per socket.recv() reader.
+    """
+
+    def recv(self, Length=-1, Terminator="\n"):
+        msg = chunk = ""
+        loop = 0
+        while chunk != Terminator:
+            try:
+                chunk = self.Socket.recv(1).decode()
+                self.recv_calls += 1
+            except Exception:
+                self.close()
+                return ["ERROR", "%s communication problem" % self.Name]
+            if chunk != "":
+                msg = msg + chunk
+                loop = 0
+            else:
+                loop += 1
+                if loop > 10:
+                    return ["ERROR", "%s server communication loop timeout" % self.Name]
+
+        return ["OK", msg[:-2]]
+
+
+def run(iserver, count, command):
+    """
+    Send count commands in one session and return elapsed time in seconds.
+    """
+
+    with iserver.session():
+        iserver.transaction(command)  # connect outside timing
+        iserver.reset_stats()
+        t0 = time.perf_counter()
+        for _ in range(count):
+            reply = iserver.transaction(command)
+            if reply[0] != "OK":
+                raise RuntimeError(reply)
+        elapsed = time.perf_counter() - t0
+
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-n", "--count", type=int, default=2000, help="replies per mode"
+    )
+    parser.add_argument("--command", default="ONLAMP HE/AR", help="command to send")
+    args = parser.parse_args()
+
+    sim = Opto22Simulator()
+    sim.start()
+
+    print(f"{'reader':<10} {'replies':>8} {'recv/reply':>11} {'us/reply':>10}")
+    try:
+        for name, cls in (
+            ("legacy", LegacyInstrumentServerInterface),
+            ("buffered", InstrumentServerInterface),
+        ):
+            iserver = cls(sim.host, sim.port, "opto22simulator")
+            elapsed = run(iserver, args.count, args.command)
+            stats = iserver.get_stats()
+            print(
+                f"{name:<10} {args.count:>8} {stats['recv_calls'] / args.count:>11.1f} "
+                f"{elapsed / args.count * 1e6:>10.1f}"
+            )
+    finally:
+        sim.stop()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Measure BokTCS header-read and slew-wait latency against a local BokTCSSimulator.
+Usage example:
+  python -m azcam_bcspec.benchmarks.tcs_latency --latency 0.002 --jitter 0.002 --fragment 16
+"""
+
+import argparse
+import time
+
+from azcam.server import setup_server
+
+from azcam_bcspec.benchmarks import percentiles
+from azcam_bcspec.simulators.tcs import BokTCSSimulator
+
+
+def make_telescope(sim, persistent=1):
+    """
+    Returns an initialized BokTCS which talks to the simulator.
+    """
+
+    from azcam_bcspec.telescope_bok import BokTCS
+
+    telescope = BokTCS()
+    telescope.initialize()
+    telescope.Tserver.Host = sim.host
+    telescope.Tserver.Port = sim.port
+    telescope.Tserver.persistent = persistent
+
+    return telescope
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--count", type=int, default=200, help="header reads")
+    parser.add_argument("--latency", type=float, default=0.0, help="reply latency [s]")
+    parser.add_argument("--jitter", type=float, default=0.0, help="reply jitter [s]")
+    parser.add_argument("--fragment", type=int, default=0, help="segment size [bytes]")
+    parser.add_argument("--slews", type=int, default=3, help="number of slews")
+    args = parser.parse_args()
+
+    setup_server()
+
+    sim = BokTCSSimulator()
+    sim.latency = args.latency
+    sim.jitter = args.jitter
+    sim.fragment = args.fragment
+    sim.start()
+
+    print(f"{'operation':<28} {'p50 ms':>8} {'p99 ms':>8}")
+    try:
+        for persistent in (0, 1):
+            telescope = make_telescope(sim, persistent)
+            label = "reused" if persistent else "per-packet"
+
+            times = []
+            for _ in range(args.count):
+                t0 = time.perf_counter()
+                header = telescope.read_header()
+                times.append(time.perf_counter() - t0)
+                assert isinstance(header, list), header
+            p50, p99 = percentiles(times)
+            print(f"{'read_header ' + label:<28} {p50 * 1e3:>8.2f} {p99 * 1e3:>8.2f}")
+
+            times = []
+            for _ in range(args.count):
+                t0 = time.perf_counter()
+                telescope.get_keyword("RA")
+                times.append(time.perf_counter() - t0)
+            p50, p99 = percentiles(times)
+            print(
+                f"{'get_keyword RA ' + label:<28} {p50 * 1e3:>8.2f} {p99 * 1e3:>8.2f}"
+            )
+
+        # slew-wait overhead beyond the simulated slew time
+        overheads = []
+        packets = sum(sim.packets.values())
+        for i in range(args.slews):
+            t0 = time.perf_counter()
+            telescope.move("%02d0000.00" % (12 + i % 2), "+300000.0")
+            elapsed = time.perf_counter() - t0
+            overheads.append(elapsed - sim.last_slew_time)
+        packets = sum(sim.packets.values()) - packets
+        p50, p99 = percentiles(overheads)
+        print(f"{'wait_for_move overhead':<28} {p50 * 1e3:>8.2f} {p99 * 1e3:>8.2f}")
+        print(f"TCS packets per slew: {packets / args.slews:.1f}")
+        print(f"TCS connections: {sim.connections}")
+    finally:
+        sim.stop()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare the one pass TelemetryDecoder with per-keyword TelcomServerInterface.parse_keyword.
+Uses the REQUEST ALL corpus in data/tcs_request_all.txt.
+Usage example:
+  python -m azcam_bcspec.benchmarks.telemetry_decode -n 200
+"""
+
+import argparse
+import os
+import time
+
+from azcam_bcspec.telescope_bok import TelcomServerInterface
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "tcs_request_all.txt")
+
+
+def read_corpus(filename=CORPUS):
+    """
+    Returns the list of telemetry strings in a corpus file, with the packet header stripped.
+    """
+
+    tserver = TelcomServerInterface()
+    l1 = len(tserver.TELID) + len(tserver.SYSID) + len(tserver.PID)
+
+    records = []
+    with open(filename, "r") as f1:
+        for line in f1.readlines():
+            if line.startswith("#"):
+                continue
+            line = line.rstrip("\n")
+            if len(line) == 0:
+                continue
+            records.append(line[l1 + 1 :])
+
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-n", "--repeat", type=int, default=200, help="passes over the corpus"
+    )
+    args = parser.parse_args()
+
+    tserver = TelcomServerInterface()
+    records = read_corpus()
+    keywords = sorted(tserver.Offsets)
+
+    # both paths must agree before timing them
+    for telemetry in records:
+        record = tserver.decoder.decode(telemetry)
+        for key in keywords:
+            assert record[key] == tserver.parse_keyword(key, telemetry)[1], key
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for telemetry in records:
+            values = [tserver.parse_keyword(key, telemetry)[1] for key in keywords]
+    legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for telemetry in records:
+            values = tserver.decoder.decode(telemetry).values
+    decoder = time.perf_counter() - t0
+
+    count = args.repeat * len(records)
+    print(f"{len(records)} records x {args.repeat} passes, {len(keywords)} keywords")
+    print(f"{'path':<14} {'us/record':>10}")
+    print(f"{'per-keyword':<14} {legacy / count * 1e6:>10.2f}")
+    print(f"{'decoder':<14} {decoder / count * 1e6:>10.2f}")
+    print(f"speedup {legacy / decoder:.1f}x")
+
+    return
+
+
+if __name__ == "__main__":
+    main()
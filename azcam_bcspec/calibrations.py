@@ -0,0 +1,267 @@
+# Contains the CalibrationSequence class which takes pipelined calibration sequences.
+
+import threading
+import time
+
+import azcam
+import azcam.exceptions
+from azcam.tools.tools import Tools
+from azcam_bcspec.tracing import tracer
+
+
+class CalibrationSequence(Tools):
+    """
+    Takes a sequence of arcs, flats and other frames using the instrument and exposure tools.
+    When pipelining, the lamps for the next frame are switched as soon as the shutter closes
+    so they warm up during readout and image transfer, and lamps used by consecutive frames
+    stay lit. Each frame then only waits for the warm-up remaining.
+    Without pipelining each frame uses the serial pattern of set_active_comps, comps_on,
+    comps_delay, expose, comps_off.
+    Usage example:
+      calibrations.run([["HE/AR/NE", 30.0, 5], ["FE/NE", 60.0, 3], ["flat", 5.0, 10, "CONT"]])
+    """
+
+    def __init__(self, tool_id="calibrations", description="bcspec calibrations"):
+        super().__init__(tool_id, description)
+
+        # 1 to overlap lamp changes and warm-up with readout
+        self.pipeline = 1
+
+        # frames of the last run as [imagetype, lamps, exposure time, warm-up waited, warm-up
+        # needed by the serial pattern, seconds from the end of the previous frame]
+        self.frames = []
+        self.report = {}
+
+        # lamp change started when the shutter closed
+        self.switch_thread = None
+        self.switch_error = None
+
+    def get_frames(self, steps):
+        """
+        Returns the list of frames in a sequence as [imagetype, exposure time, lamps].
+        Each step is [imagetype, exposure time, number of frames] with an optional fourth
+        element giving the lamps, as in set_active_comps(). Comparison image types are lamp
+        names (e.g. HE/AR/NE) and use those lamps if none are given.
+        """
+
+        exposure = azcam.db.tools["exposure"]
+        instrument = azcam.db.tools["instrument"]
+
+        frames = []
+        for step in steps:
+            imagetype = step[0]
+            exposure_time = float(step[1])
+            count = int(step[2]) if len(step) > 2 else 1
+
+            if len(step) > 3:
+                lamps = step[3]
+            elif imagetype.lower() in exposure.image_types:
+                lamps = []
+            else:
+                lamps = imagetype
+            if not lamps:
+                lamps = []
+            elif isinstance(lamps, str):
+                lamps = instrument.lamp_names(lamps)
+            else:
+                lamps = [name for lamp in lamps for name in instrument.lamp_names(lamp)]
+
+            frames.extend([[imagetype, exposure_time, lamps]] * count)
+
+        return frames
+
+    def run(self, steps, title=""):
+        """
+        Take a calibration sequence and return its report, see get_frames() for steps.
+        Lamps are turned off at the end.
+        """
+
+        exposure = azcam.db.tools["exposure"]
+        instrument = azcam.db.tools["instrument"]
+
+        frames = self.get_frames(steps)
+
+        self.frames = []
+        self.report = {}
+        comp_sequence = exposure.comp_sequence
+        after_integrate = getattr(exposure, "after_integrate", None)
+
+        t0 = time.perf_counter()
+        last = t0
+        error = None
+        try:
+            exposure.comp_sequence = 1
+            for i, (imagetype, exposure_time, lamps) in enumerate(frames):
+                nextlamps = frames[i + 1][2] if i + 1 < len(frames) else []
+
+                if self.pipeline:
+                    self._wait_for_lamps()
+                    instrument.lamp_transaction([[lamp, 1] for lamp in lamps])
+                    exposure.after_integrate = lambda: self._start_lamp_switch(
+                        lamps, nextlamps
+                    )
+                else:
+                    instrument.lamp_transaction([[lamp, 1] for lamp in lamps])
+
+                # warm-up for serial pattern, lamps were just turned on
+                needed = self._get_warmup(lamps)
+
+                instrument.set_active_comps(lamps)
+                waited = 0.0
+                if lamps:
+                    waited = max(0.0, instrument.get_warmup_remaining())
+                    instrument.comps_delay()
+
+                exposure.expose(exposure_time, imagetype, title)
+
+                if not self.pipeline:
+                    instrument.lamp_transaction([[lamp, 0] for lamp in lamps])
+
+                t1 = time.perf_counter()
+                self.frames.append(
+                    [imagetype, lamps, exposure_time, waited, needed, t1 - last]
+                )
+                last = t1
+
+                if azcam.db.abortflag:
+                    azcam.log("Calibration sequence aborted")
+                    break
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            exposure.after_integrate = after_integrate
+            exposure.comp_sequence = comp_sequence
+            azcam.db.abortflag = 0
+
+            # a lamp error here must not replace the error which ended the sequence
+            try:
+                if self.switch_thread is not None:
+                    self.switch_thread.join()
+                    self.switch_thread = None
+                    self.switch_error = None
+                instrument.lamp_transaction([[lamp, 0] for lamp in instrument.Lamps])
+            except Exception as e:
+                if error is None:
+                    raise
+                azcam.log(f"could not turn lamps off after calibration error: {e}")
+
+        self.report = self.get_report(time.perf_counter() - t0)
+        for line in self.get_report_lines():
+            azcam.log(line)
+
+        return self.report
+
+    def get_report(self, seconds=None):
+        """
+        Returns the report of the last run as a dictionary.
+        The serial time is not measured, it is estimated as the run time plus the warm-up
+        the serial pattern would have waited for each frame and the pipelined run did not.
+        For a serial run the estimate is the run time.
+        """
+
+        if seconds is None:
+            seconds = sum(frame[5] for frame in self.frames)
+        nframes = len(self.frames)
+
+        if self.pipeline:
+            serial = seconds + sum(frame[4] - frame[3] for frame in self.frames)
+        else:
+            serial = seconds
+
+        return {
+            "frames": nframes,
+            "pipeline": self.pipeline,
+            "seconds": seconds,
+            "frames_per_hour": 3600.0 * nframes / seconds if seconds > 0 else 0.0,
+            "serial_estimate_seconds": serial,
+            "serial_estimate_frames_per_hour": (
+                3600.0 * nframes / serial if serial > 0 else 0.0
+            ),
+            "warmup_waited": sum(frame[3] for frame in self.frames),
+            "warmup_serial": sum(frame[4] for frame in self.frames),
+        }
+
+    def get_report_lines(self):
+        """
+        Returns the report of the last run as a list of lines.
+        """
+
+        report = self.report
+        if not report:
+            return []
+
+        mode = "pipelined" if report["pipeline"] else "serial"
+        lines = [
+            f"Calibration sequence ({mode}): {report['frames']} frames in "
+            f"{report['seconds']:.1f} s, {report['frames_per_hour']:.1f} frames/hour",
+        ]
+        if report["pipeline"]:
+            lines.append(
+                f"  serial estimate {report['serial_estimate_seconds']:.1f} s, "
+                f"{report['serial_estimate_frames_per_hour']:.1f} frames/hour, lamp warm-up waited "
+                f"{report['warmup_waited']:.1f} s of {report['warmup_serial']:.1f} s"
+            )
+
+        return lines
+
+    def _get_warmup(self, lamps):
+        """
+        Returns the full warm-up in seconds for a list of lamps.
+        """
+
+        if not lamps:
+            return 0.0
+
+        instrument = azcam.db.tools["instrument"]
+
+        return max(
+            instrument.LampWarmups.get(lamp, instrument.DefaultWarmup) for lamp in lamps
+        )
+
+    def _start_lamp_switch(self, lamps, nextlamps):
+        """
+        Called when the shutter closes, switch from lamps to nextlamps in a thread.
+        Lamps used by both frames are not changed.
+        """
+
+        self.switch_error = None
+        self.switch_thread = threading.Thread(
+            target=self._switch_lamps, name="lampswitch", args=[lamps, nextlamps]
+        )
+        self.switch_thread.daemon = True
+        self.switch_thread.start()
+
+        return
+
+    def _switch_lamps(self, lamps, nextlamps):
+        """
+        Lamp switching thread.
+        """
+
+        instrument = azcam.db.tools["instrument"]
+
+        operations = [[lamp, 0] for lamp in lamps] + [[lamp, 1] for lamp in nextlamps]
+        try:
+            with tracer.span("lamp switch"):
+                instrument.lamp_transaction(operations)
+        except Exception as e:
+            self.switch_error = e
+
+        return
+
+    def _wait_for_lamps(self):
+        """
+        Wait for a lamp switch started at the end of the previous integration.
+        """
+
+        if self.switch_thread is not None:
+            self.switch_thread.join()
+            self.switch_thread = None
+
+        if self.switch_error is not None:
+            error = self.switch_error
+            self.switch_error = None
+            raise azcam.exceptions.AzcamError(f"could not switch lamps: {error}")
+
+        return
@@ -2,20 +2,25 @@
 Setup method for mont4k azcamconsole.
 Usage example:
   ipython -i -m azcam_bcspc.console --profile azcamconsole
+  ipython -i -m azcam_bcspc.console --profile azcamconsole -- -host 10.30.1.2
 """
 
 import os
 import sys
-import threading
+
+from azcam_bcspec.startup import StartupProfiler, StartupScheduler, connect_server
+
+profiler = StartupProfiler("bcspec console")
 
 import azcam
 import azcam.utils
 import azcam_console.console
 from azcam_console.tools.console_tools import create_console_tools
 import azcam_console.shortcuts
-from azcam.tools.ds9display import Ds9Display
 import azcam_console.tools.console_tools
 
+profiler.mark("imports")
+
 
 def setup():
     # command line arguments
@@ -24,47 +29,74 @@ def setup():
         datafolder = sys.argv[i + 1]
     except ValueError:
         datafolder = None
+    try:
+        i = sys.argv.index("-host")
+        host = sys.argv[i + 1]
+    except ValueError:
+        host = getattr(azcam.db.server, "host", "") or "localhost"
+    try:
+        i = sys.argv.index("-port")
+        port = int(sys.argv[i + 1])
+    except ValueError:
+        port = 2452
 
     # files and folders
-    azcam.db.systemname = "bcspec"
-    azcam.db.systemfolder = f"{os.path.dirname(__file__)}"
-    azcam.db.datafolder = azcam.utils.get_datafolder(datafolder)
+    with profiler.phase("folders and logging"):
+        azcam.db.systemname = "bcspec"
+        azcam.db.systemfolder = f"{os.path.dirname(__file__)}"
+        azcam.db.datafolder = azcam.utils.get_datafolder(datafolder)
 
-    parfile = os.path.join(
-        azcam.db.datafolder,
-        "parameters",
-        f"parameters_console_{azcam.db.systemname}.ini",
-    )
+        parfile = os.path.join(
+            azcam.db.datafolder,
+            "parameters",
+            f"parameters_console_{azcam.db.systemname}.ini",
+        )
 
-    # start logging
-    logfile = os.path.join(azcam.db.datafolder, "logs", "console.log")
-    azcam.db.logger.start_logging(logfile=logfile)
-    azcam.log(f"Configuring console for {azcam.db.systemname}")
+        # start logging
+        logfile = os.path.join(azcam.db.datafolder, "logs", "console.log")
+        azcam.db.logger.start_logging(logfile=logfile)
+        azcam.log(f"Configuring console for {azcam.db.systemname}")
 
-    # display
-    display = Ds9Display()
-    dthread = threading.Thread(target=display.initialize, args=[])
-    dthread.start()  # thread just for speed
+    # display, initialize waits for ds9 so it is not waited for
+    display = []
 
-    # console tools
-    create_console_tools()
+    def create_display():
+        from azcam.tools.ds9display import Ds9Display
 
-    # observe
-    azcam.log("Loading observe")
-    from azcam_console.observe.observe_cli.observe_cli import ObserveCli
+        display.append(Ds9Display())
 
-    observe = ObserveCli()
+    def initialize_display():
+        display[0].initialize()
+
+    # observe
+    def load_observe():
+        azcam.log("Loading observe")
+        from azcam_console.observe.observe_cli.observe_cli import ObserveCli
 
-    # try to connect to azcamserver
-    connected = azcam.db.server.connect(port=2452)
-    if connected:
-        azcam.log("Connected to azcamserver")
-    else:
-        azcam.log("Not connected to azcamserver")
+        observe = ObserveCli()
 
     # par file
-    azcam.db.parameters.read_parfile(parfile)
-    azcam.db.parameters.update_pars()
+    def read_pars():
+        azcam.db.parameters.read_parfile(parfile)
+        azcam.db.parameters.update_pars()
+
+    # server, waits at most a few seconds then retries in background
+    def connect_azcamserver():
+        connect_server(
+            lambda: azcam.db.server.connect(host=host, port=port), host, port
+        )
+
+    scheduler = StartupScheduler(profiler)
+    scheduler.add("display", create_display)
+    scheduler.add("display init", initialize_display, ["display"], background=True)
+    scheduler.add("console tools", create_console_tools)
+    scheduler.add("observe", load_observe, ["console tools"])
+    scheduler.add("server connect", connect_azcamserver)
+    scheduler.add("par file", read_pars, ["display", "console tools", "observe"])
+    scheduler.run()
+
+    profiler.report()
+    scheduler.report()
 
 
 # start
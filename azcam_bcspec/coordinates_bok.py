@@ -0,0 +1,100 @@
+# Contains the BokCoordinates class for Az/Alt to RA/Dec transforms at the Bok telescope.
+
+import numpy
+from astropy import units as u
+from astropy.coordinates import AltAz, Angle, EarthLocation, SkyCoord
+from astropy.time import Time
+
+# degrees of RA per second of time for a fixed Az/Alt position
+SIDEREAL_RATE = 360.98564736629 / 86400.0
+
+
+class BokCoordinates(object):
+    """
+    Vectorized Az/Alt to RA/Dec transforms for the Bok site.
+    The site location is built from fixed coordinates so the astropy site registry is not needed.
+    The AltAz frame is reused for frame_tolerance seconds, RA is then corrected for the sidereal
+    motion since the frame time.
+    """
+
+    # Bok site, as in the SITELAT/SITELONG/SITEELEV header template keywords
+    latitude = 31.0 + 57.8 / 60.0  # degrees N
+    longitude = -(111.0 + 36.0 / 60.0)  # degrees E
+    elevation = 2120.0  # meters
+
+    def __init__(self):
+        self.location = EarthLocation.from_geodetic(
+            lon=self.longitude * u.deg,
+            lat=self.latitude * u.deg,
+            height=self.elevation * u.m,
+        )
+
+        # cached AltAz frame and its time
+        self.frame = None
+        self.frame_time = None
+        self.frame_tolerance = 60.0  # seconds
+
+    def get_frame(self, obstime=None):
+        """
+        Returns an AltAz frame at or near obstime (default now).
+        """
+
+        if obstime is None:
+            obstime = Time.now()
+
+        if (
+            self.frame is None
+            or abs((obstime - self.frame_time).sec) > self.frame_tolerance
+        ):
+            self.frame = AltAz(obstime=obstime, location=self.location)
+            self.frame_time = obstime
+
+        return self.frame
+
+    def azalt_to_radec(self, azimuth, altitude, obstime=None):
+        """
+        Transform Az/Alt positions in degrees to ICRS RA and Dec in degrees at obstime (default now).
+        azimuth and altitude may be scalars or arrays, all positions are transformed in one call.
+        Returns (ra, dec) arrays.
+        """
+
+        if obstime is None:
+            obstime = Time.now()
+
+        frame = self.get_frame(obstime)
+        target = SkyCoord(
+            numpy.atleast_1d(azimuth) * u.deg,
+            numpy.atleast_1d(altitude) * u.deg,
+            frame=frame,
+        )
+        coord = target.transform_to("icrs")
+
+        ra = self.drift_ra(coord.ra.deg, (obstime - self.frame_time).sec)
+
+        return ra, coord.dec.deg
+
+    @staticmethod
+    def drift_ra(ra, seconds):
+        """
+        Returns RA in degrees of a fixed Az/Alt position seconds later.
+        """
+
+        return numpy.mod(ra + SIDEREAL_RATE * seconds, 360.0)
+
+    @staticmethod
+    def format_radec(ra, dec):
+        """
+        Returns RA and Dec in degrees as TCS strings without colons (hhmmss.ss, +ddmmss.s).
+        """
+
+        ra = Angle(ra, unit=u.deg).to_string(
+            sep="", precision=2, pad=True, unit="hourangle"
+        )
+        dec = Angle(dec, unit=u.deg).to_string(
+            sep="", precision=1, pad=True, alwayssign=True
+        )
+
+        if numpy.ndim(ra) == 0:
+            return str(ra), str(dec)
+
+        return ra, dec
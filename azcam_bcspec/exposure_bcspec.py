@@ -0,0 +1,366 @@
+# Contains the ExposureBCSpec class for the Bok B&C spectrograph.
+
+import functools
+import threading
+import time
+
+import azcam
+import azcam.exceptions
+from azcam.tools.arc.exposure_arc import ExposureArc
+from azcam_bcspec.tracing import tracer
+
+
+class ExposureBCSpec(ExposureArc):
+    """
+    ARC exposure class for BCSpec.
+    Header sources (instrument, telescope, bokpop) are read concurrently, each with its own deadline.
+    Source threads only read data, which is put in the header by the calling thread.
+    A source which misses its deadline or fails, for example while its host is marked
+    unavailable, uses its last-known values, marked stale in the header of that image only.
+    Exposure stages are recorded as spans of the exposure timeline trace.
+    The telescope samples telemetry while integrating, and its header is set from those
+    samples before the image is written.
+    """
+
+    def __init__(self, tool_id="exposure", description=None):
+        super().__init__(tool_id, description)
+
+        # seconds each header source may take before its last-known values are used
+        self.header_deadline = 2.0
+        self.header_deadlines = {"bokpop": 1.5}
+
+        # last-known header values and timings for each source
+        self.header_cache = {}
+        self.header_times = {}
+        self.header_threads = {}
+
+        # [header name, keyword, comment] of keywords marked stale in the last update
+        self.header_stale = []
+
+        # called when the shutter closes, e.g. to switch lamps for the next frame
+        self.after_integrate = None
+
+        # trace FITS writes and image transfers
+        self.image.write_file = tracer.wrap(self.image.write_file, "fits write")
+        self.sendimage.send_image = tracer.wrap(self.sendimage.send_image, "sendimage")
+
+    def begin(self, exposure_time=-1, imagetype="", title=""):
+        """
+        Begin an exposure.
+        """
+
+        with tracer.span("begin"):
+            return super().begin(exposure_time, imagetype, title)
+
+    def integrate(self):
+        """
+        Integration.
+        """
+
+        telescope = self._get_sampling_telescope()
+        if telescope is not None:
+            telescope.integration_start(self.exposure_time)
+
+        try:
+            with tracer.span("integration"):
+                return super().integrate()
+        finally:
+            if telescope is not None:
+                telescope.integration_end()
+            if self.after_integrate is not None:
+                try:
+                    self.after_integrate()
+                except Exception as e:
+                    azcam.log(f"after integration: {e}")
+
+    def readout(self):
+        """
+        Readout.
+        """
+
+        with tracer.span("readout"):
+            return super().readout()
+
+    def end(self):
+        """
+        Write and send the image.
+        """
+
+        with tracer.span("end"):
+            telescope = self._get_sampling_telescope()
+            if telescope is not None:
+                with tracer.span("telescope header"):
+                    header = telescope.update_exposure_header()
+
+                # telescope values are now current even if they were stale at begin
+                if header is not None:
+                    self._clear_stale_source("telescope")
+
+            return super().end()
+
+    def _get_sampling_telescope(self):
+        """
+        Returns the telescope tool if it samples telemetry during exposures, else None.
+        """
+
+        telescope = azcam.db.tools.get("telescope")
+        if telescope is None or not hasattr(telescope, "update_exposure_header"):
+            return None
+        if not telescope.is_enabled:
+            return None
+
+        return telescope
+
+    def get_header_sources(self):
+        """
+        Returns a list of [name, fetch, apply] for each header source.
+        fetch() runs in its own thread and returns data without changing any header.
+        apply(data) puts the data in the header in the calling thread.
+        """
+
+        sources = []
+
+        # same objects as Exposure.update_headers
+        for objectname in azcam.db.headers:
+            if objectname in ["controller", "system", "exposure", "focalplane"]:
+                continue
+            tool = azcam.db.tools.get(objectname)
+            if tool is None:
+                continue
+
+            # a tool which cannot be set up uses its last-known values, as its read would fail
+            try:
+                # delete all keywords if not enabled
+                if not tool.is_enabled:
+                    tool.header.delete_all_keywords()
+                    continue
+                if not tool.is_initialized:
+                    tool.initialize()
+                tool.define_keywords()
+                read = getattr(tool, "get_header_data", tool.read_header)
+                fetch = functools.partial(self._read_tool_header, read)
+            except Exception as e:
+                fetch = functools.partial(self._raise_header_error, e)
+
+            sources.append(
+                [
+                    objectname,
+                    fetch,
+                    functools.partial(self._set_tool_header, objectname),
+                ]
+            )
+
+        instrument = azcam.db.tools.get("instrument")
+        if instrument is not None and instrument.is_enabled:
+            if getattr(instrument, "use_bokpop", 0):
+                sources.append(
+                    [
+                        "bokpop",
+                        instrument.read_bokpop,
+                        instrument.set_bokpop_header,
+                    ]
+                )
+
+        return sources
+
+    def update_headers(self):
+        """
+        Update all headers, reading current data.
+        All sources are read at the same time so the slowest source sets the total time.
+        """
+
+        # set flag that update is in progress
+        self.updating_header = 1
+        tracer.begin("update headers")
+
+        # stale marks are only for the previous image
+        self._clear_stale_marks()
+
+        sources = self.get_header_sources()
+
+        self.header_times = {}
+        # results of sources which miss their deadline go to this dictionary after it
+        # is no longer used, so they are dropped
+        results = {}
+        threads = self.header_threads
+        for name, fetch, apply in sources:
+            # a source still busy from a previous update is not started again
+            if name in threads and threads[name].is_alive():
+                continue
+            thread = threading.Thread(
+                target=self._fetch_header,
+                name=f"header_{name}",
+                args=[name, fetch, results],
+            )
+            thread.daemon = True
+            thread.start()
+            threads[name] = thread
+
+        t0 = time.perf_counter()
+        stale = []
+        for name, fetch, apply in sources:
+            deadline = self.header_deadlines.get(name, self.header_deadline)
+            threads[name].join(max(0.0, deadline - (time.perf_counter() - t0)))
+
+            result = results.get(name)
+            if result is None:
+                self.header_times[name] = None
+                stale.append(name)
+                self._use_cached_header(name, apply)
+                continue
+
+            self.header_times[name] = result[2]
+            if result[0] != "OK":
+                azcam.log(f"could not get {name} header: {result[1]}")
+                stale.append(name)
+                self._use_cached_header(name, apply)
+                continue
+
+            apply(result[1])
+            self.header_cache[name] = result[1]
+
+        timings = ", ".join(
+            f"{name} {'stale' if t is None else f'{t:.3f}'}"
+            for name, t in self.header_times.items()
+        )
+        azcam.log(f"Header sources (s): {timings}", level=1 if stale else 2)
+
+        if stale:
+            self.set_keyword(
+                "HDRSTALE", " ".join(stale), "Header sources using last values", "str"
+            )
+        else:
+            self.delete_keyword("HDRSTALE")
+
+        # update focalplane header which is not in db
+        self.image.focalplane.update_header()
+
+        # try to update system header last
+        if "system" in azcam.db.headers:
+            try:
+                azcam.db.headers["system"].update_header()
+            except Exception:
+                pass
+
+        # set flag that update is finished
+        self.updating_header = 0
+        tracer.end("update headers")
+
+        return
+
+    def _fetch_header(self, name, fetch, results):
+        """
+        Header source thread.
+        """
+
+        t0 = time.perf_counter()
+        try:
+            reply = ["OK", fetch()]
+        except Exception as e:
+            reply = ["ERROR", e]
+        t1 = time.perf_counter()
+        reply.append(t1 - t0)
+        tracer.add(f"header {name}", t0, t1, None if reply[0] == "OK" else {"error": 1})
+
+        results[name] = reply
+
+        return
+
+    def _read_tool_header(self, read):
+        """
+        Returns the header list from a tool's read function, raising an error on an error reply.
+        """
+
+        reply = read()
+        if reply is None:
+            return []
+        if reply and reply[0] == "ERROR":
+            raise azcam.exceptions.AzcamError(reply[1])
+
+        return reply
+
+    def _raise_header_error(self, error):
+        """
+        Header source read for a tool which could not be set up.
+        """
+
+        raise error
+
+    def _set_tool_header(self, name, data):
+        """
+        Put a header list in a tool header.
+        """
+
+        header = azcam.db.headers[name]
+        for key, value, comment, typestring in data:
+            header.set_keyword(key, value, comment, typestring)
+
+        return
+
+    def _use_cached_header(self, name, apply):
+        """
+        Put last-known values for a source in the header, marked as stale.
+        The cached comments are not changed so the mark is removed by the next update.
+        """
+
+        cache = self.header_cache.get(name)
+        if cache is None:
+            azcam.log(f"{name} header not read, no previous values")
+            return
+
+        azcam.log(f"{name} header not read, using last values")
+
+        headername = "instrument" if name == "bokpop" else name
+        data = []
+        for item in cache:
+            key, value, comment = item[:3]
+            self.header_stale.append([headername, key, comment])
+            if name == "bokpop":
+                comment = '"%s (stale)"' % comment.strip('"')
+            else:
+                comment = f"{comment} (stale)"
+            data.append([key, value, comment] + list(item[3:]))
+        apply(data)
+
+        return
+
+    def _clear_stale_marks(self, headername=None):
+        """
+        Restore the comments of keywords marked stale in the last update,
+        for all headers or only for headername.
+        """
+
+        stale = []
+        for item in self.header_stale:
+            if headername is not None and item[0] != headername:
+                stale.append(item)
+                continue
+            header = azcam.db.headers.get(item[0])
+            key, comment = item[1:]
+            if header is None or key not in header.values:
+                continue
+            header.set_keyword(
+                key, header.values[key], comment, header.typestrings.get(key)
+            )
+        self.header_stale = stale
+
+        return
+
+    def _clear_stale_source(self, name):
+        """
+        Remove a source from HDRSTALE and its stale marks, after its header was read again.
+        """
+
+        self._clear_stale_marks(name)
+
+        if "HDRSTALE" not in self.header.get_keywords():
+            return
+        stale = [n for n in self.header.values["HDRSTALE"].split() if n != name]
+        if stale:
+            self.set_keyword(
+                "HDRSTALE", " ".join(stale), "Header sources using last values", "str"
+            )
+        else:
+            self.delete_keyword("HDRSTALE")
+
+        return
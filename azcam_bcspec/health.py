@@ -0,0 +1,255 @@
+# Contains the CircuitBreaker class which tracks the health of the bcspec device hosts.
+
+import socket
+import threading
+import time
+
+import azcam
+
+
+class CircuitBreaker(object):
+    """
+    Health of one device host, each host and port of a device has its own breaker.
+    After max_failures consecutive failures the breaker opens and calls fail fast
+    instead of waiting for socket timeouts. After backoff seconds a background probe
+    connects to the host; if it succeeds the breaker is half-open and the next call
+    closes it on success or opens it again on failure. Each failed probe or half-open
+    call doubles the backoff, up to max_backoff seconds.
+    state is "closed", "open", or "half-open".
+    Usage example:
+      if not breaker.allow():
+          return ["ERROR", breaker.get_message()]
+      ...
+      breaker.record(error)
+    """
+
+    def __init__(
+        self, name, host="", port=0, max_failures=3, backoff=10.0, max_backoff=120.0
+    ):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.label = f"{name} {host}:{port}"
+
+        self.max_failures = max_failures
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = 1.0
+
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Close the breaker and clear its counters.
+        """
+
+        with self.lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.current_backoff = self.backoff
+            self.retry_time = 0.0  # time.monotonic() when the next probe may run
+            self.probing = 0
+            self.last_error = ""
+            self.last_failure = None  # time.time() of events
+            self.last_success = None
+            self.opened = None
+            self.failures = 0
+            self.rejected = 0
+            self.opens = 0
+            self.probes = 0
+
+        return
+
+    def allow(self):
+        """
+        Returns True if a call may be made to the host.
+        While open, starts a background probe once the backoff has elapsed.
+        """
+
+        with self.lock:
+            if self.state != "open":
+                return True
+
+            self.rejected += 1
+            if self.probing or time.monotonic() < self.retry_time:
+                return False
+            self.probing = 1
+
+        thread = threading.Thread(target=self.probe, name=f"probe_{self.name}")
+        thread.daemon = True
+        thread.start()
+
+        return False
+
+    def record(self, error=0, message=""):
+        """
+        Record the result of one call, error is true if the host failed.
+        Server error replies are not failures, only connection and timeout errors.
+        """
+
+        log = None
+        with self.lock:
+            if not error:
+                if self.state != "closed":
+                    log = f"{self.label} restored"
+                self.state = "closed"
+                self.consecutive_failures = 0
+                self.current_backoff = self.backoff
+                self.last_success = time.time()
+            else:
+                self.failures += 1
+                self.consecutive_failures += 1
+                self.last_failure = time.time()
+                self.last_error = str(message)
+                if self.state == "half-open":
+                    self._open(self.current_backoff * 2)
+                    log = (
+                        f"{self.label} still failing, "
+                        f"failing fast for {self.current_backoff:.1f} s"
+                    )
+                elif (
+                    self.state == "closed"
+                    and self.consecutive_failures >= self.max_failures
+                ):
+                    self._open(self.backoff)
+                    log = (
+                        f"{self.label} unavailable after {self.consecutive_failures} failures, "
+                        f"failing fast for {self.current_backoff:.1f} s: {message}"
+                    )
+
+        if log is not None:
+            azcam.log(log)
+
+        return
+
+    def probe(self):
+        """
+        Connect to the host to check if it is back.
+        Returns True if the connection succeeded, in which case an open breaker becomes half-open.
+        """
+
+        ok = False
+        error = "no address to probe"
+        try:
+            if self.host:
+                address = (self.host, int(self.port))
+                with socket.create_connection(address, self.probe_timeout):
+                    ok = True
+        except Exception as e:
+            error = str(e)
+
+        log = None
+        with self.lock:
+            self.probes += 1
+            self.probing = 0
+            if self.state == "open":
+                if ok:
+                    self.state = "half-open"
+                    log = f"{self.label} probe succeeded, retrying calls"
+                else:
+                    self.last_error = error
+                    self._open(self.current_backoff * 2)
+
+        if log is not None:
+            azcam.log(log)
+
+        return ok
+
+    def get_message(self):
+        """
+        Returns the error message for a call which is not allowed.
+        """
+
+        retry = max(0.0, self.retry_time - time.monotonic())
+
+        return (
+            f"{self.label} unavailable, retry in {retry:.1f} s"
+            f" (last error: {self.last_error})"
+        )
+
+    def as_dict(self):
+        """
+        Returns the health state as a dictionary.
+        """
+
+        with self.lock:
+            return {
+                "device": self.name,
+                "host": self.host,
+                "port": self.port,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "opens": self.opens,
+                "probes": self.probes,
+                "last_error": self.last_error,
+                "last_failure": self.last_failure,
+                "last_success": self.last_success,
+                "opened": self.opened,
+                "retry_in": (
+                    max(0.0, self.retry_time - time.monotonic())
+                    if self.state == "open"
+                    else None
+                ),
+            }
+
+    def _open(self, backoff):
+        """
+        Open the breaker for backoff seconds, called with lock held.
+        """
+
+        if self.state != "open":
+            self.opens += 1
+            self.opened = time.time()
+        self.state = "open"
+        self.current_backoff = min(backoff, self.max_backoff)
+        self.retry_time = time.monotonic() + self.current_backoff
+
+        return
+
+
+# (device name, host, port) : CircuitBreaker
+breakers = {}
+breakers_lock = threading.Lock()
+
+
+def get_breaker(name, host="", port=0):
+    """
+    Returns the CircuitBreaker for a device host and port, created on first use.
+    Clients of the same device on different hosts, e.g. a simulator, do not share a breaker.
+    """
+
+    key = (name, host, int(port))
+    breaker = breakers.get(key)
+    if breaker is None:
+        with breakers_lock:
+            breaker = breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(name, host, int(port))
+                breakers[key] = breaker
+
+    return breaker
+
+
+def get_breakers(name=None):
+    """
+    Returns the list of CircuitBreakers for all devices, or for one device name.
+    """
+
+    return [
+        breaker
+        for breaker in list(breakers.values())
+        if name is None or breaker.name == name
+    ]
+
+
+def get_health(name=None):
+    """
+    Returns a dictionary of "device host:port" : health state for all devices, or for one device.
+    azcammonitor reads this through the metrics tool (metrics.get_health()) or /bcspec/health,
+    as azcam.db.monitor has no interface for registering it.
+    """
+
+    return {breaker.label: breaker.as_dict() for breaker in get_breakers(name)}
@@ -1,18 +1,25 @@
 # Contains BCSpecInstrument class for the Bok B&C spectrograph.
 
+import contextlib
 import json
 import socket
 import time
 
 import azcam
 import azcam.exceptions
+from azcam.header import Header
 from azcam.tools.instrument import Instrument
+from azcam_bcspec.health import get_breaker
+from azcam_bcspec.metrics import get_device
+from azcam_bcspec.tracing import tracer
 
 
 class BCSpecInstrument(Instrument):
     """
     The interface to the BCSpec spectrograph instrument at Bok.
     The InstrumentServer is J. Fookson's Ruby server for the Opto22.
+    The state of each lamp is tracked so that only changes are sent to the server and
+    lamp warm-up delays only wait for the time remaining since a lamp was turned on.
     """
 
     # Valid lamp names
@@ -27,11 +34,28 @@ class BCSpecInstrument(Instrument):
         self.Port = 9875
         self.ActiveComps = [""]
 
+        # lamp : 1 for on or 0 for off, lamps not listed are in an unknown state
+        self.LampStates = {}
+        # lamp : time.monotonic() when it was turned on, for lamps which are on
+        self.LampOnTimes = {}
+        # warm-up seconds for each lamp, others use DefaultWarmup
+        self.LampWarmups = {"FE/NE": 10}
+        self.DefaultWarmup = 2
+
         self.use_bokpop = 0
+        self.bokpop = None
 
         # opto22 server interface
         self.Iserver = InstrumentServerInterface(self.Host, self.Port, self.Name)
 
+        # header which counts changes, replacing the one made by Instrument
+        self.header = InstrumentHeader("Instrument")
+        self.header.set_header("instrument", 3)
+
+        # [layout version, keyword table] and [version, header list] for read_header()
+        self.header_table = None
+        self.header_cache = None
+
         # add keywords
         self.define_keywords()
 
@@ -43,16 +67,10 @@ class BCSpecInstrument(Instrument):
         if not self.is_initialized:
             self.initialize()
 
-        reply = self.Iserver.open()
-        if reply[0] == "OK":
-            reply = self.Iserver.recv()[1]  # read string and ignore for now
-            self.Iserver.send(Command, "")  # no terminator
-            reply = self.Iserver.recv()[1]
-            self.Iserver.send("CLIENTDONE", "")
-            self.Iserver.recv()[1]  # read string and ignore for now
-            self.Iserver.close()
-        else:
+        reply = self.Iserver.transaction(Command)
+        if reply[0] != "OK":
             return reply
+        reply = reply[1]
 
         # check for error, valid replies starts with 'OK: ' and errors with '?: '
         if reply.startswith("OK"):
@@ -71,15 +89,23 @@ class BCSpecInstrument(Instrument):
             return
 
         cmd = "INITOPTO"
-        reply = self.Iserver.command(cmd)
+        reply = self.Iserver.transaction(cmd)
+
+        # INITOPTO turns all lamps off, states are only known once the server confirms it
+        self.LampOnTimes = {}
+        if reply[0] == "OK" and reply[1].startswith("OK"):
+            self.LampStates = {lamp: 0 for lamp in self.Lamps}
+        else:
+            self.LampStates = {}
 
         self.is_initialized = 1
 
         return reply
 
-    def test(self):
+    def test(self, DelayTime=1):
         """
         Test the B&C lamps.
+        Each lamp is on for DelayTime seconds and then off for DelayTime seconds.
         """
 
         lamps = self.get_comps()
@@ -87,10 +113,10 @@ class BCSpecInstrument(Instrument):
             print("%s ON" % lamp)
             self.set_active_comps(lamp)
             self.comps_on()
-            time.sleep(1)
+            time.sleep(DelayTime)
             self.comps_off()
             print("%s OFF" % lamp)
-            time.sleep(1)
+            time.sleep(DelayTime)
 
         return
 
@@ -99,21 +125,43 @@ class BCSpecInstrument(Instrument):
     def comps_delay(self, DelayTime=0):
         """
         Delay for lamp warmup.
-        If DelayTime==0, use internal fixed delays based on ActiveComps.
+        If DelayTime==0, use internal fixed delays for each lamp in ActiveComps.
+        Only the warm-up time remaining since each lamp was turned on is waited for.
+        Lamps which are not known to be on get their full warm-up.
         """
 
-        if DelayTime == 0:
-            if "FE/NE" in self.ActiveComps:
-                delay = 10
-            else:
-                delay = 2
-        else:
-            delay = DelayTime
+        delay = self.get_warmup_remaining(DelayTime)
 
-        time.sleep(delay)
+        with tracer.span("comps delay", {"seconds": round(delay, 3)}):
+            if delay > 0:
+                time.sleep(delay)
 
         return
 
+    def get_warmup_remaining(self, DelayTime=0):
+        """
+        Returns the seconds of lamp warm-up remaining for ActiveComps.
+        If DelayTime==0, use internal fixed delays for each lamp, otherwise DelayTime for all lamps.
+        """
+
+        if not self.ActiveComps:
+            return DelayTime if DelayTime else self.DefaultWarmup
+
+        now = time.monotonic()
+        delay = 0
+        for lamp in self.ActiveComps:
+            lamp = lamp.upper()
+            if DelayTime == 0:
+                warmup = self.LampWarmups.get(lamp, self.DefaultWarmup)
+            else:
+                warmup = DelayTime
+            on_time = self.LampOnTimes.get(lamp)
+            if on_time is not None:
+                warmup = warmup - (now - on_time)
+            delay = max(delay, warmup)
+
+        return delay
+
     def get_comps(self, CompID=0):
         return self.get_active_comps(CompID)
 
@@ -130,18 +178,22 @@ class BCSpecInstrument(Instrument):
         return self.set_active_comps(CompNames, CompTypeID)
 
     def set_active_comps(self, CompNames=[], CompTypeID=0):
+        """
+        Set the active comparison lamps.
+        Names are uppercase as in Lamps, Exposure.begin() sets comps from the lowercase imagetype.
+        """
+
+        if type(CompNames) != list:
+            CompNames = [CompNames]
+
         comps = []
-        if type(CompNames) == list:
-            for lamp in CompNames:
-                if lamp == "HE/AR/NE":
-                    comps.append("HE/AR")
-                    comps.append("NEON")
-                else:
-                    comps.append(lamp.strip("'\""))
-        elif CompNames == "HE/AR/NE":
-            comps = ["HE/AR", "NEON"]
-        else:
-            comps.append(CompNames.strip("'\""))
+        for lamp in CompNames:
+            lamp = lamp.strip("'\"").upper()
+            if lamp == "HE/AR/NE":
+                comps.append("HE/AR")
+                comps.append("NEON")
+            elif lamp:
+                comps.append(lamp)
 
         self.ActiveComps = comps
 
@@ -158,8 +210,8 @@ class BCSpecInstrument(Instrument):
         # so we want this?
         # reply=self.lamps_off_all()
 
-        for lamp in self.ActiveComps:
-            self.lamp_on(lamp)
+        with tracer.span("comps on"):
+            self.lamp_transaction([[lamp, 1] for lamp in self.ActiveComps])
 
         return
 
@@ -173,8 +225,8 @@ class BCSpecInstrument(Instrument):
 
         # reply=self.lamps_off_all()
 
-        for lamp in self.ActiveComps:
-            self.lamp_off(lamp)
+        with tracer.span("comps off"):
+            self.lamp_transaction([[lamp, 0] for lamp in self.ActiveComps])
 
         return
 
@@ -186,26 +238,7 @@ class BCSpecInstrument(Instrument):
         if not self.is_enabled:
             return
 
-        if not LampName.upper() in self.Lamps and LampName.upper() != "HE/AR/NE":
-            raise azcam.exceptions.AzcamError(f"Invalid lamp name: {LampName}")
-
-        if LampName.upper() == "FE/NE":
-            for i in range(2):
-                cmd = "ONLAMP " + LampName.upper()
-                self.command(cmd)
-                cmd = "OFFLAMP " + LampName.upper()
-                self.command(cmd)
-            cmd = "ONLAMP " + LampName.upper()
-            self.command(cmd)
-        else:
-            if LampName.upper() == "HE/AR/NE":
-                cmd = "ONLAMP HE/AR"
-                self.command(cmd)
-                cmd = "ONLAMP NEON"
-                self.command(cmd)
-            else:
-                cmd = "ONLAMP " + LampName.upper()
-                self.command(cmd)
+        self.lamp_transaction([[LampName, 1]])
 
         return
 
@@ -217,30 +250,155 @@ class BCSpecInstrument(Instrument):
         if not self.is_enabled:
             return
 
-        if not LampName.upper() in self.Lamps and LampName.upper() != "HE/AR/NE":
-            raise azcam.exceptions.AzcamError(f"Invalid lamp name: {LampName}")
-
-        if LampName.upper() == "HE/AR/NE":
-            cmd = "OFFLAMP HE/AR"
-            self.command(cmd)
-            cmd = "OFFLAMP NEON"
-            self.command(cmd)
-        else:
-            cmd = "OFFLAMP " + LampName.upper()
-            self.command(cmd)
+        self.lamp_transaction([[LampName, 0]])
 
         return
 
     def lamps_off_all(self):
         """
         Turn all lamps off.
+        Every lamp is commanded, whatever its tracked state, as lamps may have been
+        turned on outside azcam.
         """
 
         # cmd='OFFALL'
         # reply=self.command(cmd)
 
+        self.reset_lamp_states()
+        self.lamp_transaction([[lamp, 0] for lamp in self.Lamps])
+
+        return
+
+    def get_lamp_states(self):
+        """
+        Returns a dictionary of lamp : [state, seconds on].
+        state is "on", "off", or "unknown" before the first command or after a failed one.
+        """
+
+        now = time.monotonic()
+        states = {}
         for lamp in self.Lamps:
-            self.lamp_off(lamp)
+            state = self.LampStates.get(lamp)
+            if state is None:
+                states[lamp] = ["unknown", None]
+            elif state:
+                on_time = self.LampOnTimes.get(lamp)
+                states[lamp] = ["on", None if on_time is None else now - on_time]
+            else:
+                states[lamp] = ["off", None]
+
+        return states
+
+    def reset_lamp_states(self):
+        """
+        Forget the lamp states, so the next command for each lamp is sent.
+        Use when lamps may have been changed outside azcam.
+        """
+
+        self.LampStates = {}
+        self.LampOnTimes = {}
+
+        return
+
+    def lamp_names(self, LampName):
+        """
+        Returns the list of lamps for a lamp name, which may be HE/AR/NE.
+        """
+
+        lamp = LampName.upper()
+        if lamp not in self.Lamps and lamp != "HE/AR/NE":
+            raise azcam.exceptions.AzcamError(f"Invalid lamp name: {LampName}")
+
+        if lamp == "HE/AR/NE":
+            return ["HE/AR", "NEON"]
+
+        return [lamp]
+
+    def lamp_commands(self, LampName, State):
+        """
+        Returns the list of server commands which turn a lamp on (State=1) or off (State=0).
+        """
+
+        commands = []
+        for lamp in self.lamp_names(LampName):
+            if State:
+                # FE/NE is cycled before it stays on
+                if lamp == "FE/NE":
+                    commands.extend(["ONLAMP FE/NE", "OFFLAMP FE/NE"] * 2)
+                commands.append("ONLAMP " + lamp)
+            else:
+                commands.append("OFFLAMP " + lamp)
+
+        return commands
+
+    def lamp_transaction(self, Operations):
+        """
+        Turn several lamps on or off using one instrument server session.
+        Operations is a list of [LampName, State] pairs with State 1 for on and 0 for off.
+        All lamps are turned off before any are turned on, so a lamp both turned off
+        and on ends up on. Lamps already in the requested state are not commanded.
+        Returns a list of [command, reply, seconds] for each command sent.
+        """
+
+        if not self.is_enabled:
+            return []
+
+        # validate all operations before sending anything, lamp : final state
+        states = {}
+        for lamp, state in Operations:
+            for name in self.lamp_names(lamp):
+                states[name] = max(states.get(name, 0), int(state))
+
+        if not self.is_initialized:
+            self.initialize()
+
+        off_commands = []
+        on_commands = []
+        for lamp, state in states.items():
+            if self.LampStates.get(lamp) == state:
+                continue
+            if state:
+                on_commands.extend(self.lamp_commands(lamp, 1))
+            else:
+                off_commands.extend(self.lamp_commands(lamp, 0))
+
+        steps = []
+        if not off_commands and not on_commands:
+            return steps
+
+        with self.Iserver.session():
+            for cmd in off_commands + on_commands:
+                state, lamp = cmd.split(" ", 1)
+                t0 = time.perf_counter()
+                try:
+                    reply = self.command(cmd)
+                except Exception:
+                    self._set_lamp_state(lamp, None)
+                    raise
+                steps.append([cmd, reply, time.perf_counter() - t0])
+
+                # error replies from the server interface are lists
+                if isinstance(reply, str):
+                    self._set_lamp_state(lamp, int(state == "ONLAMP"))
+                else:
+                    self._set_lamp_state(lamp, None)
+
+        return steps
+
+    def _set_lamp_state(self, Lamp, State):
+        """
+        Record a lamp state, 1 for on, 0 for off, or None for unknown.
+        """
+
+        if State is None:
+            self.LampStates.pop(Lamp, None)
+            self.LampOnTimes.pop(Lamp, None)
+        elif State:
+            self.LampStates[Lamp] = 1
+            self.LampOnTimes[Lamp] = time.monotonic()
+        else:
+            self.LampStates[Lamp] = 0
+            self.LampOnTimes.pop(Lamp, None)
 
         return
 
@@ -265,7 +423,9 @@ class BCSpecInstrument(Instrument):
     def read_header(self):
         """
         Reads and returns current header data.
-        This method looks up all keywords and queries hardware for the current value of each keyword.
+        All keywords are converted in one pass using a keyword/comment/type table which is only
+        rebuilt when keywords are added or deleted or a comment or type changes.
+        The result is reused until any header value changes.
         Returns [Header[]]: Each element Header[i] contains the sublist (keyword, value, comment, and type).
         Example: Header[2][1] is the value of keyword 2 and Header[2][3] is its type.
         Type is one of 'str', 'int', 'float', or 'complex'.
@@ -275,15 +435,29 @@ class BCSpecInstrument(Instrument):
             azcam.exceptions.warning("instrument not enabled")
             return
 
+        version = self.header.version
+        cache = self.header_cache
+        if cache is not None and cache[0] == version:
+            return [list(item) for item in cache[1]]
+
+        layout_version = self.header.layout_version
+        if self.header_table is None or self.header_table[0] != layout_version:
+            self.header_table = [layout_version, self.header.get_table()]
+
+        values = self.header.values
         header = []
-        reply = self.header.get_keywords()
+        for key, comment, t, converter in self.header_table[1]:
+            try:
+                value = values[key]
+            except KeyError:
+                raise azcam.exceptions.AzcamError(f"Keyword {key} not defined")
+            header.append([key, converter(value), comment, t])
 
-        for key in reply:
-            reply = self.get_keyword(key)
-            list1 = [key, reply[0], reply[1], reply[2]]
-            header.append(list1)
+        # not cached if the header changed while it was read
+        if self.header.version == version:
+            self.header_cache = [version, header]
 
-        return header
+        return [list(item) for item in header]
 
     # *** INFRASTRUCTURE ***
 
@@ -292,7 +466,25 @@ class BCSpecInstrument(Instrument):
         Get info from bokpop server.
         """
 
-        bokpopdata = self.bokpop.makeHeader()
+        bokpopdata = self.read_bokpop()
+        self.set_bokpop_header(bokpopdata)
+
+        return bokpopdata
+
+    def read_bokpop(self):
+        """
+        Read header data from bokpop server without changing the header.
+        """
+
+        if self.bokpop is None:
+            self.bokpop = BokData()
+
+        return self.bokpop.makeHeader()
+
+    def set_bokpop_header(self, bokpopdata):
+        """
+        Put header data read from bokpop server in the instrument header.
+        """
 
         for item in bokpopdata:
             keyword = item[0]
@@ -300,7 +492,71 @@ class BCSpecInstrument(Instrument):
             comment = item[2]
             self.header.set_keyword(keyword, value, comment, "str")
 
-        return bokpopdata
+        return
+
+
+# *** instrument header ***
+
+
+class InstrumentHeader(Header):
+    """
+    Header which counts changes so BCSpecInstrument.read_header() can reuse its work.
+    version changes when any keyword changes, layout_version only when keywords are
+    added or deleted or a comment or type changes.
+    Setting a keyword to its current value, comment and type is not a change.
+    """
+
+    def __init__(self, title="", template=None):
+        self.version = 0
+        self.layout_version = 0
+
+        super().__init__(title, template)
+
+    def set_keyword(self, keyword, value, comment=None, typestring=None):
+        layout = [
+            keyword in self.keywords,
+            self.comments.get(keyword),
+            self.typestrings.get(keyword),
+        ]
+        old_value = self.values.get(keyword)
+
+        super().set_keyword(keyword, value, comment, typestring)
+
+        value = self.values[keyword]
+        if layout != [True, self.comments[keyword], self.typestrings[keyword]]:
+            self.layout_version += 1
+            self.version += 1
+        elif value != old_value or type(value) is not type(old_value):
+            self.version += 1
+
+        return
+
+    def delete_keyword(self, keyword):
+        if keyword in self.keywords or keyword in self.values:
+            self.layout_version += 1
+            self.version += 1
+
+        super().delete_keyword(keyword)
+
+        return
+
+    def get_table(self):
+        """
+        Returns [keyword, comment, type, converter] for each keyword in header order.
+        converter(value) gives the value as Header.convert_type() does for type.
+        """
+
+        table = []
+        for key in self.get_keywords():
+            typestring = self.typestrings[key]
+            if typestring == "int":
+                table.append([key, self.comments[key], "int", int])
+            elif typestring == "float":
+                table.append([key, self.comments[key], "float", float])
+            else:
+                table.append([key, self.comments[key], "str", str])
+
+        return table
 
 
 # *** instrument server interface ***
@@ -315,6 +571,7 @@ class InstrumentServerInterface(object):
     Host = ""  # instrument server host
     Port = 0  # instrument server port
     Timeout = 5.0  # socket timeout in seconds
+    ChunkSize = 4096  # socket read size in bytes
     OK = "OK"
     ERROR = "ERROR"
 
@@ -323,6 +580,33 @@ class InstrumentServerInterface(object):
         self.Port = Port
         self.Name = Name
 
+        self.Socket = None
+
+        # received data not yet returned as a reply
+        self.rxbuffer = bytearray()
+
+        # session mode keeps one logged in connection open across many commands
+        self.session_depth = 0
+        self.logged_in = 0
+
+        # connection statistics
+        self.connects = 0
+        self.round_trips = 0
+        self.reconnects = 0
+        self.recv_calls = 0
+
+        # latency histograms, errors and bytes by command type
+        self.metrics = get_device("instrument")
+
+
+    def get_health(self):
+        """
+        Returns the CircuitBreaker which fails fast while the instrument server at the current host
+        and port is unreachable.
+        """
+
+        return get_breaker("instrument", self.Host, self.Port)
+
     def open(self, Host="", Port=-1):
         """
         Open a socket connection to an instrument.
@@ -337,8 +621,10 @@ class InstrumentServerInterface(object):
 
         self.Socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.Socket.settimeout(float(self.Timeout))
+        self.rxbuffer.clear()
         try:
             self.Socket.connect((self.Host, self.Port))
+            self.connects += 1
             return ["OK"]
         except Exception:
             self.close()
@@ -349,6 +635,9 @@ class InstrumentServerInterface(object):
         Close an open socket connection to an instrument.
         """
 
+        self.logged_in = 0
+        self.rxbuffer.clear()
+
         try:
             self.Socket.close()
         except Exception:
@@ -356,21 +645,181 @@ class InstrumentServerInterface(object):
 
         return ["OK"]
 
+    def login(self):
+        """
+        Open a connection and read the server banner.
+        """
+
+        reply = self.open()
+        if reply[0] != "OK":
+            return reply
+
+        reply = self.recv()  # read banner and ignore for now
+        self.round_trips += 1
+        if reply[0] != "OK":
+            self.close()
+            return reply
+
+        self.logged_in = 1
+
+        return ["OK"]
+
+    def logout(self):
+        """
+        Send CLIENTDONE and close the connection.
+        """
+
+        if self.logged_in:
+            reply = self.send("CLIENTDONE", "")
+            if reply[0] == "OK":
+                self.recv()  # read string and ignore for now
+                self.round_trips += 1
+
+        return self.close()
+
+    def transaction(self, Command):
+        """
+        Send one command to the server using the banner/command/CLIENTDONE handshake.
+        In session mode the connection stays open after the command and a failed
+        connection is reopened once before giving up.
+        While the server is marked unavailable an error is returned immediately.
+        Returns the exact reply from the server.
+        """
+
+        health = self.get_health()
+        if not health.allow():
+            return ["ERROR", health.get_message()]
+
+        t0 = time.perf_counter()
+
+        for attempt in range(2):
+            if not self.logged_in:
+                reply = self.login()
+                if reply[0] != "OK":
+                    break
+
+            reply = self.send(Command, "")  # no terminator
+            if reply[0] == "OK":
+                reply = self.recv()
+                self.round_trips += 1
+
+            if reply[0] == "OK":
+                break
+
+            # connection failed, reconnect only if it was a reused session connection
+            self.close()
+            if self.session_depth == 0 or attempt > 0:
+                break
+            self.reconnects += 1
+            self.metrics.add_reconnect()
+
+        if reply[0] == "OK" and self.session_depth == 0:
+            self.logout()
+
+        self.record(Command, time.perf_counter() - t0, reply)
+        health.record(reply[0] != "OK", reply[-1])
+
+        return reply
+
+    def start_session(self):
+        """
+        Start session mode so that following transactions share one connection.
+        Sessions may be nested, the connection is closed by the outermost end_session().
+        """
+
+        self.session_depth += 1
+
+        return ["OK"]
+
+    def end_session(self):
+        """
+        End session mode and close the connection to the server.
+        """
+
+        if self.session_depth > 0:
+            self.session_depth -= 1
+
+        if self.session_depth == 0 and self.logged_in:
+            self.logout()
+
+        return ["OK"]
+
+    @contextlib.contextmanager
+    def session(self):
+        """
+        Context manager for session mode.
+        Example: with Iserver.session(): ...
+        """
+
+        self.start_session()
+        try:
+            yield self
+        finally:
+            self.end_session()
+
+    def get_stats(self):
+        """
+        Returns a dictionary of connection statistics.
+        """
+
+        stats = {
+            "connects": self.connects,
+            "round_trips": self.round_trips,
+            "reconnects": self.reconnects,
+            "recv_calls": self.recv_calls,
+        }
+
+        return stats
+
+    def reset_stats(self):
+        """
+        Reset connection statistics.
+        """
+
+        self.connects = 0
+        self.round_trips = 0
+        self.reconnects = 0
+        self.recv_calls = 0
+
+        return
+
     def command(self, Command, Terminator="\r\n"):
         """
         Communicte with the remote instrument server.
         Opens and closes the socket each time.
+        While the server is marked unavailable an error is returned immediately.
         Returns the exact reply from the server.
         """
 
+        health = self.get_health()
+        if not health.allow():
+            return ["ERROR", health.get_message()]
+
+        t0 = time.perf_counter()
+
         reply = self.open()
         if reply[0] == "OK":
             reply = self.send(Command, Terminator)
             if reply[0] == "OK":
                 reply = self.recv(-1, "\n")
 
+        self.record(Command, time.perf_counter() - t0, reply)
+        health.record(reply[0] != "OK", reply[-1])
+
         return reply
 
+    def record(self, Command, Seconds, Reply):
+        """
+        Add a command to the device metrics, by command type (first word of the command).
+        Server replies starting with "?" are counted as errors.
+        """
+
+        words = Command.split(None, 1)
+        error = Reply[0] != "OK" or (len(Reply) > 1 and Reply[1].startswith("?"))
+        self.metrics.record(words[0] if words else "", Seconds, error)
+
+        return
+
     def send(self, Command, Terminator="\r\n"):
         """
         send a command string to a socket instrument.
@@ -378,9 +827,9 @@ class InstrumentServerInterface(object):
         """
 
         try:
-            self.Socket.send(
-                str.encode(Command + Terminator)
-            )  # send command with terminator
+            data = str.encode(Command + Terminator)
+            self.Socket.send(data)  # send command with terminator
+            self.metrics.add_bytes(sent=len(data))
             return ["OK"]
         except Exception:
             self.close()
@@ -390,14 +839,22 @@ class InstrumentServerInterface(object):
         """
         Receives a reply from a socket instrument.
         Terminates the socket read when Length bytes are received or when the Terminator is received.
+        Data are read in chunks into a receive buffer, bytes after the Terminator are kept for the next reply.
         @param Length is the number of bytes to receive.  -1 means receive through Terminator character.
         @param Terminator is the terminator character.
         """
 
         if Length == -2:
+            if len(self.rxbuffer) > 0:
+                msg = self.rxbuffer.decode()
+                self.rxbuffer.clear()
+                return ["OK", msg]
             try:
                 self.Socket.settimeout(3)
-                msg = self.Socket.recv(1024).decode()
+                msg = self.Socket.recv(self.ChunkSize)
+                self.recv_calls += 1
+                self.metrics.add_bytes(received=len(msg))
+                msg = msg.decode()
                 self.Socket.settimeout(self.Timeout)
                 return ["OK", msg]
             except Exception:
@@ -405,29 +862,47 @@ class InstrumentServerInterface(object):
 
         # receive Length bytes
         if Length != -1:
-            msg = self.Socket.recv(Length).decode()
+            if len(self.rxbuffer) == 0:
+                self.rxbuffer += self.Socket.recv(Length)
+                self.recv_calls += 1
+                self.metrics.add_bytes(received=len(self.rxbuffer))
+            msg = self.rxbuffer[:Length].decode()
+            del self.rxbuffer[:Length]
             return ["OK", msg]
 
         # receive with terminator
-        msg = chunk = ""
-        loop = 0
-        while chunk != Terminator:  # CR LF is usually '\n' when translated
+        term = Terminator.encode()
+        deadline = time.monotonic() + self.Timeout
+        start = 0
+        while True:
+            index = self.rxbuffer.find(term, start)
+            if index >= 0:
+                break
+            start = max(0, len(self.rxbuffer) - len(term) + 1)  # only search new data
+
+            if time.monotonic() > deadline:
+                self.close()
+                return ["ERROR", "%s server communication timeout" % self.Name]
             try:
-                chunk = self.Socket.recv(1).decode()
+                chunk = self.Socket.recv(self.ChunkSize)
+                self.recv_calls += 1
+                self.metrics.add_bytes(received=len(chunk))
             except Exception:
                 self.close()
                 return ["ERROR", "%s communication problem" % self.Name]
-            if chunk != "":
-                msg = msg + chunk
-                loop = 0
-            else:
-                loop += 1
-                if loop > 10:
-                    return ["ERROR", "%s server communication loop timeout" % self.Name]
+            if chunk == b"":
+                self.close()
+                return ["ERROR", "%s server closed connection" % self.Name]
+            self.rxbuffer += chunk
+
+        # decode the reply in place, removing CR/LF
+        end = index
+        if end > 0 and self.rxbuffer[end - 1] == 13:
+            end -= 1
+        with memoryview(self.rxbuffer) as view:
+            Reply = str(view[:end], "utf-8")
+        del self.rxbuffer[: index + len(term)]
 
-        Reply = msg[:-2]  # remove CR/LF
-        if Reply is None:
-            Reply = ""
         return ["OK", Reply]
 
 
@@ -468,39 +943,95 @@ class BokData(socket.socket):
         ("wobble", "WOB", "Wobble"),
     )
 
+    # bokserv keywords with numeric values, all others are kept as received
+    numeric_keywords = (
+        "udome_dewpoint",
+        "udome_temp",
+        "udome_humid",
+        "indewpoint",
+        "inhumid",
+        "intemp",
+        "outdewpoint",
+        "outhumid",
+        "outtemp",
+        "mcell_dewpoint",
+        "mcell_humid",
+        "mcell_temp",
+        "wind_speed",
+        "wind_direction",
+        "airmass",
+        "azimuth",
+        "dome",
+        "elevation",
+        "epoch",
+        "iis",
+        "julian_date",
+        "motion",
+        "wobble",
+    )
+
     def __init__(self, HOST="10.30.1.3", PORT=5554, timeout=1.0):
-        # self.timeout=timeout
+        # socket timeout, only reached if the reply is incomplete
+        self.read_timeout = timeout
         self.host = HOST
         self.port = PORT
 
+        # last complete JSON document received
+        self.data = ""
+        self.document = None
+
+        # fetch latency histogram, errors and bytes
+        self.metrics = get_device("bokpop")
+
         self.kwmap = self.keyword_header_map
 
+        # header plan of [bokserv keyword, fits keyword, quoted comment, converter]
+        self.header_plan = []
+        for kw, fitskw, descr in self.kwmap:
+            if kw in self.numeric_keywords:
+                converter = _to_float
+            else:
+                converter = None
+            self.header_plan.append([kw, fitskw, '"' + descr + '"', converter])
+
         socket.socket.__init__(self, socket.AF_INET, socket.SOCK_STREAM)
 
     def listen(self):
-        # listen for incomming socket data
-        test = True
-        resp = ""
-        while test:
+        # listen for incomming socket data, returning as soon as
+        # one complete JSON document has been received
+        resp = bytearray()
+        self.document = None
+        while True:
             try:
-                newStuff = self.recv(100).decode()
+                newStuff = self.recv(4096)
             except socket.timeout:
-                return resp
+                return resp.decode()
 
-            if newStuff:
-                resp += newStuff
-            else:
-                return resp
+            if not newStuff:
+                return resp.decode()
+            resp += newStuff
+            self.metrics.add_bytes(received=len(newStuff))
+
+            # a complete document ends with its closing brace
+            if resp.rstrip().endswith(b"}"):
+                try:
+                    self.document = json.loads(resp)
+                except ValueError:
+                    continue
+                return resp.decode()
 
     def converse(self, message):
         # send socket data and then listen for a response
         self.send(str.encode(message))
+        self.metrics.add_bytes(sent=len(message))
         return self.listen()
 
     def getAll(self):
         # retrieve all information from the bokpop server
         self.data = self.converse("all\n")
         # convert to python dict type and return.
+        if self.document is not None:
+            return self.document
         return json.loads(self.data)
 
     def putHeader(self, fitsfd):
@@ -509,15 +1040,12 @@ class BokData(socket.socket):
         # descriptions in to the fits
         # header.
         all_data = self.getAll()
-        for Map in self.kwmap:
-            kw, fitskw, descr = Map
-            val = self.extract(all_data, kw)
+        index = self.flatten(all_data)
+        for (kw, fitskw, descr), plan in zip(self.kwmap, self.header_plan):
+            val = index.get(kw)
+            if plan[3] is not None and val is not None:
+                val = plan[3](val)
             print(kw, val, descr)
-            try:
-                # lazily look for numbers
-                val = float(val)
-            except ValueError:
-                pass
 
             fitsfd[0].header[fitskw] = (val, descr)
 
@@ -529,29 +1057,38 @@ class BokData(socket.socket):
         # all_data = self.getAll()
 
         all_data = self.get_header_data()
-        header = []
-        for Map in self.kwmap:
-            kw, fitskw, descr = Map
-            val = self.extract(all_data, kw)
-            try:
-                # lazily look for numbers
-                val = float(val)
-            except ValueError:
-                pass
-            except Exception:
-                pass
 
-            keyword1 = fitskw
-            value1 = val
-            comment1 = '"' + descr + '"'
+        return self.headerFromData(all_data)
 
-            header.append([keyword1, value1, comment1])
+    def headerFromData(self, all_data):
+        # make the header list from bokserv data using one keyword index
+        index = self.flatten(all_data)
+        header = []
+        for kw, fitskw, comment1, converter in self.header_plan:
+            value1 = index.get(kw)
+            if converter is not None and value1 is not None:
+                value1 = converter(value1)
 
-            if keyword1 == "LST-OBS":
+            header.append([fitskw, value1, comment1])
+
+            if fitskw == "LST-OBS":
                 header.append(["ST", value1, '"local siderial time"'])
 
         return header
 
+    def flatten(self, pyDict, index=None):
+        # make a keyword index of all non-dict values in a nested dict,
+        # the first value found for a keyword is kept (same as extract)
+        if index is None:
+            index = {}
+        for key, val in pyDict.items():
+            if type(val) == dict:
+                self.flatten(val, index)
+            elif key not in index:
+                index[key] = val
+
+        return index
+
     def extract(self, pyDict, keyword):
         # Extract fits header data from bokserver
         # using the kwmap
@@ -564,20 +1101,46 @@ class BokData(socket.socket):
                 if key == keyword:
                     return val
 
+    def get_health(self):
+        """
+        Returns the CircuitBreaker which fails fast while the bokpop server at the current host
+        and port is unreachable.
+        """
+
+        return get_breaker("bokpop", self.host, self.port)
+
     def get_header_data(self):
         """
         Added for AzCam
         """
 
-        # open socket
+        health = self.get_health()
+        if not health.allow():
+            raise azcam.exceptions.AzcamError(health.get_message())
+
+        # open a new socket, closing any previous one so its descriptor is not leaked
+        self.close()
         socket.socket.__init__(self, socket.AF_INET, socket.SOCK_STREAM)
-        if self.timeout:
-            self.settimeout(self.timeout)
-        HOST = socket.gethostbyname(self.host)
-        self.connect((HOST, int(self.port)))
+        if self.read_timeout:
+            self.settimeout(self.read_timeout)
 
-        # get data
-        reply = self.getAll()
+        t0 = time.perf_counter()
+        error = 1
+        message = ""
+        try:
+            HOST = socket.gethostbyname(self.host)
+            self.connect((HOST, int(self.port)))
+
+            # get data
+            reply = self.getAll()
+            error = 0
+        except Exception as e:
+            message = e
+            raise
+        finally:
+            self.close()
+            self.metrics.record("all", time.perf_counter() - t0, error)
+            health.record(error, message)
 
         # output
         return reply
@@ -590,3 +1153,11 @@ class BokData(socket.socket):
         self.makeHeader()
 
         return
+
+
+def _to_float(value):
+    # numeric bokserv values may arrive as strings
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
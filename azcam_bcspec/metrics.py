@@ -0,0 +1,257 @@
+# Contains device I/O metrics for the bcspec instrument, telescope and bokpop clients.
+
+import bisect
+import threading
+
+import azcam
+from azcam.tools.tools import Tools
+from azcam_bcspec.health import get_breakers, get_health
+
+# histogram bucket upper bounds in seconds, 0.1 ms to 52 s, plus an overflow bucket
+BUCKETS = [0.0001 * 2**i for i in range(20)]
+
+
+class LatencyHistogram(object):
+    """
+    Fixed bucket latency histogram.
+    """
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """
+        Add one latency in seconds.
+        """
+
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+        return
+
+    def percentile(self, fraction):
+        """
+        Returns the bucket upper bound in seconds below which fraction of latencies fall.
+        """
+
+        if self.count == 0:
+            return None
+
+        rank = fraction * self.count
+        total = 0
+        for i, count in enumerate(self.counts):
+            total += count
+            if total >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+
+        return self.max
+
+    def as_dict(self):
+        """
+        Returns the histogram as a dictionary.
+        """
+
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.percentile(0.50),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "buckets": [
+                [BUCKETS[i] if i < len(BUCKETS) else None, count]
+                for i, count in enumerate(self.counts)
+                if count
+            ],
+        }
+
+
+class DeviceMetrics(object):
+    """
+    Latency histograms and error counts by command type, plus reconnects and bytes, for one device.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all metrics.
+        """
+
+        with self.lock:
+            self.histograms = {}
+            self.errors = {}
+            self.reconnects = 0
+            self.bytes_sent = 0
+            self.bytes_received = 0
+
+        return
+
+    def record(self, command, seconds, error=0):
+        """
+        Record one command of type command which took seconds, error is true if it failed.
+        """
+
+        with self.lock:
+            histogram = self.histograms.get(command)
+            if histogram is None:
+                histogram = self.histograms[command] = LatencyHistogram()
+                self.errors[command] = 0
+            histogram.record(seconds)
+            if error:
+                self.errors[command] += 1
+
+        return
+
+    def add_reconnect(self):
+        with self.lock:
+            self.reconnects += 1
+
+        return
+
+    def add_bytes(self, sent=0, received=0):
+        with self.lock:
+            self.bytes_sent += sent
+            self.bytes_received += received
+
+        return
+
+    def as_dict(self):
+        """
+        Returns the device metrics as a dictionary.
+        """
+
+        with self.lock:
+            commands = {}
+            for command, histogram in self.histograms.items():
+                commands[command] = histogram.as_dict()
+                commands[command]["errors"] = self.errors[command]
+
+            return {
+                "reconnects": self.reconnects,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "commands": commands,
+            }
+
+
+# device name : DeviceMetrics
+devices = {}
+devices_lock = threading.Lock()
+
+
+def get_device(name):
+    """
+    Returns the DeviceMetrics for a device, created on first use.
+    """
+
+    device = devices.get(name)
+    if device is None:
+        with devices_lock:
+            device = devices.setdefault(name, DeviceMetrics(name))
+
+    return device
+
+
+def get_metrics():
+    """
+    Returns a dictionary of metrics for all devices.
+    """
+
+    return {name: device.as_dict() for name, device in list(devices.items())}
+
+
+def reset_metrics():
+    """
+    Clear the metrics of all devices.
+    """
+
+    for device in list(devices.values()):
+        device.reset()
+
+    return
+
+
+class BCSpecMetrics(Tools):
+    """
+    Makes device I/O metrics and host health available as the "metrics" tool for the command
+    server and monitor, and as /bcspec/metrics and /bcspec/health on the web server.
+    azcam.db.monitor only registers the process with azcammonitor, which then reaches it through
+    the command and web server ports, so metrics are not registered with the monitor itself.
+    """
+
+    def __init__(self, tool_id="metrics", description="bcspec device metrics"):
+        super().__init__(tool_id, description)
+
+    def get_metrics(self, device=None):
+        """
+        Returns metrics for all devices, or for one device if device is specified.
+        """
+
+        if device is None:
+            return get_metrics()
+
+        return get_device(device).as_dict()
+
+    def reset(self):
+        """
+        Clear all metrics.
+        """
+
+        reset_metrics()
+
+        return
+
+    def get_health(self, device=None):
+        """
+        Returns host health for all devices, or for one device if device is specified,
+        by "device host:port".
+        state is "closed" when the host is working, "open" while calls fail fast, and
+        "half-open" after a successful probe.
+        """
+
+        return get_health(device)
+
+    def reset_health(self, device):
+        """
+        Mark the hosts of a device as working so calls are made again immediately.
+        """
+
+        for breaker in get_breakers(device):
+            breaker.reset()
+
+        return
+
+    def add_web_route(
+        self, webserver=None, path="/bcspec/metrics", health_path="/bcspec/health"
+    ):
+        """
+        Serve metrics and host health as JSON on the web server app.
+        """
+
+        from fastapi.responses import JSONResponse
+
+        if webserver is None:
+            webserver = azcam.db.webserver
+
+        @webserver.app.get(path, response_class=JSONResponse)
+        def metrics(device: str = None):
+            return JSONResponse(self.get_metrics(device))
+
+        @webserver.app.get(health_path, response_class=JSONResponse)
+        def health(device: str = None):
+            return JSONResponse(self.get_health(device))
+
+        return
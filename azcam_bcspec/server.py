@@ -7,19 +7,52 @@ Usage example:
 import os
 import sys
 
+from azcam_bcspec.startup import StartupProfiler, StartupScheduler
+
+profiler = StartupProfiler("bcspec server")
+
 import azcam
 import azcam.utils
 from azcam.server import setup_server
 import azcam.shortcuts
-from azcam.cmdserver import CommandServer
-from azcam.header import System
-from azcam.tools.arc.controller_arc import ControllerArc
-from azcam.tools.arc.exposure_arc import ExposureArc
-from azcam.tools.arc.tempcon_arc import TempConArc
-from azcam.tools.ds9display import Ds9Display
-from azcam_bcspec.instrument_bcspec import BCSpecInstrument
-from azcam_bcspec.telescope_bok import BokTCS
-from azcam.web.fastapi_server import WebServer
+
+# tool modules are imported in their setup phase so heavy dependencies load only when needed
+profiler.mark("imports")
+
+# image header order, as created by a sequential setup
+HEADER_ORDER = [
+    "system",
+    "controller",
+    "display",
+    "exposure",
+    "tempcon",
+    "instrument",
+    "focalplane",
+    "telescope",
+]
+
+# tool initialize and reset order, as created by a sequential setup,
+# tempcon reset needs a reset controller to set the control temperature
+TOOL_ORDER = [
+    "controller",
+    "tempcon",
+    "exposure",
+    "instrument",
+    "telescope",
+    "metrics",
+    "calibrations",
+    "display",
+]
+
+
+def sort_by_order(names, order):
+    """
+    Returns names sorted by their index in order, unknown names last in their current order.
+    """
+
+    return sorted(
+        names, key=lambda name: order.index(name) if name in order else len(order)
+    )
 
 
 def setup():
@@ -30,131 +63,230 @@ def setup():
     except ValueError:
         datafolder = None
 
-    setup_server()
+    with profiler.phase("server"):
+        setup_server()
 
     # define folders for system
-    azcam.db.systemname = "bcspec"
-    azcam.db.servermode = azcam.db.systemname
+    with profiler.phase("folders and logging"):
+        azcam.db.systemname = "bcspec"
+        azcam.db.servermode = azcam.db.systemname
 
-    azcam.db.systemfolder = os.path.dirname(__file__)
-    azcam.db.systemfolder = azcam.utils.fix_path(azcam.db.systemfolder)
+        azcam.db.systemfolder = os.path.dirname(__file__)
+        azcam.db.systemfolder = azcam.utils.fix_path(azcam.db.systemfolder)
 
-    azcam.db.datafolder = azcam.utils.get_datafolder(datafolder)
+        azcam.db.datafolder = azcam.utils.get_datafolder(datafolder)
 
-    parfile = os.path.join(
-        azcam.db.datafolder,
-        "parameters",
-        f"parameters_server_{azcam.db.systemname}.ini",
-    )
+        parfile = os.path.join(
+            azcam.db.datafolder,
+            "parameters",
+            f"parameters_server_{azcam.db.systemname}.ini",
+        )
 
-    # enable logging
-    logfile = os.path.join(azcam.db.datafolder, "logs", "server.log")
-    azcam.db.logger.start_logging(logfile=logfile)
-    azcam.log(f"Configuring for BCSpec")
+        # enable logging
+        logfile = os.path.join(azcam.db.datafolder, "logs", "server.log")
+        azcam.db.logger.start_logging(logfile=logfile)
+        azcam.log(f"Configuring for BCSpec")
 
     # controller
-    controller = ControllerArc()
-    controller.timing_board = "gen1"
-    controller.clock_boards = ["gen1"]
-    controller.video_boards = ["gen1"]
-    controller.utility_board = "gen1"
-    controller.set_boards()
-    controller.video_gain = 1
-    controller.video_speed = 1
-    controller.utility_file = os.path.join(
-        azcam.db.datafolder, "dspcode", "dsputility", "util1.lod"
-    )
-    controller.pci_file = os.path.join(
-        azcam.db.datafolder, "dspcode", "dsppci", "pci1.lod"
-    )
-    controller.timing_file = os.path.join(
-        azcam.db.datafolder, "dspcode", "dsptiming", "tim1_norm_LR.lod"
-    )
-    controller.camserver.set_server("10.30.1.34", 2405)
+    def setup_controller():
+        from azcam.tools.arc.controller_arc import ControllerArc
+
+        controller = ControllerArc()
+        controller.timing_board = "gen1"
+        controller.clock_boards = ["gen1"]
+        controller.video_boards = ["gen1"]
+        controller.utility_board = "gen1"
+        controller.set_boards()
+        controller.video_gain = 1
+        controller.video_speed = 1
+        controller.utility_file = os.path.join(
+            azcam.db.datafolder, "dspcode", "dsputility", "util1.lod"
+        )
+        controller.pci_file = os.path.join(
+            azcam.db.datafolder, "dspcode", "dsppci", "pci1.lod"
+        )
+        controller.timing_file = os.path.join(
+            azcam.db.datafolder, "dspcode", "dsptiming", "tim1_norm_LR.lod"
+        )
+        controller.camserver.set_server("10.30.1.34", 2405)
 
     # temperature controller
-    tempcon = TempConArc()
-    tempcon.control_temperature = -135.0
-    tempcon.set_calibrations([1, 1, 3])
+    def setup_tempcon():
+        from azcam.tools.arc.tempcon_arc import TempConArc
+
+        tempcon = TempConArc()
+        tempcon.control_temperature = -135.0
+        tempcon.set_calibrations([1, 1, 3])
 
     # exposure
-    exposure = ExposureArc()
-    exposure.filetype = exposure.filetypes["FITS"]
-    exposure.image.filetype = exposure.filetypes["FITS"]
-    exposure.display_image = 0
-    exposure.folder = azcam.db.datafolder
-    exposure.send_image = 1
-    exposure.sendimage.set_remote_imageserver("10.30.1.2", 6543, "dataserver")
-
-    ref1 = 1.0
-    ref2 = 1.0
-    exposure.image.header.set_keyword("CRPIX1", ref1, "Coordinate reference pixel")
-    exposure.image.header.set_keyword("CRPIX2", ref2, "Coordinate reference pixel")
-    CD1_1 = 1.0
-    CD1_2 = 0.0
-    CD2_1 = 0.0
-    CD2_2 = 1.0
-    exposure.image.header.set_keyword("CD1_1", CD1_1, "Coordinate matrix")
-    exposure.image.header.set_keyword("CD1_2", CD1_2, "Coordinate matrix")
-    exposure.image.header.set_keyword("CD2_1", CD2_1, "Coordinate matrix")
-    exposure.image.header.set_keyword("CD2_2", CD2_2, "Coordinate matrix")
-
-    # detector
-    detector_bcspec = {
-        "name": "1200x800",
-        "description": "STA 1200x800 CCD",
-        "ref_pixel": [600, 400],
-        "format": [1200, 18, 0, 20, 800, 0, 0, 0, 0],
-        "focalplane": [1, 1, 1, 1, [0]],
-        "roi": [1, 1200, 1, 800, 2, 2],
-        "ext_position": [[1, 1]],
-        "jpg_order": [1, 1],
-        "ctype": ["LINEAR", "LINEAR"],
-    }
-    exposure.set_detpars(detector_bcspec)
+    def setup_exposure():
+        from azcam_bcspec.exposure_bcspec import ExposureBCSpec
+
+        exposure = ExposureBCSpec()
+        exposure.filetype = exposure.filetypes["FITS"]
+        exposure.image.filetype = exposure.filetypes["FITS"]
+        exposure.display_image = 0
+        exposure.folder = azcam.db.datafolder
+        exposure.send_image = 1
+        exposure.sendimage.set_remote_imageserver("10.30.1.2", 6543, "dataserver")
+
+        # exposure timeline trace, set tracer.chrome_file for a Chrome trace
+        from azcam_bcspec.tracing import tracer
+
+        tracer.trace_file = os.path.join(
+            azcam.db.datafolder, "logs", "exposure_trace.txt"
+        )
+
+        ref1 = 1.0
+        ref2 = 1.0
+        exposure.image.header.set_keyword("CRPIX1", ref1, "Coordinate reference pixel")
+        exposure.image.header.set_keyword("CRPIX2", ref2, "Coordinate reference pixel")
+        CD1_1 = 1.0
+        CD1_2 = 0.0
+        CD2_1 = 0.0
+        CD2_2 = 1.0
+        exposure.image.header.set_keyword("CD1_1", CD1_1, "Coordinate matrix")
+        exposure.image.header.set_keyword("CD1_2", CD1_2, "Coordinate matrix")
+        exposure.image.header.set_keyword("CD2_1", CD2_1, "Coordinate matrix")
+        exposure.image.header.set_keyword("CD2_2", CD2_2, "Coordinate matrix")
+
+        # detector
+        detector_bcspec = {
+            "name": "1200x800",
+            "description": "STA 1200x800 CCD",
+            "ref_pixel": [600, 400],
+            "format": [1200, 18, 0, 20, 800, 0, 0, 0, 0],
+            "focalplane": [1, 1, 1, 1, [0]],
+            "roi": [1, 1200, 1, 800, 2, 2],
+            "ext_position": [[1, 1]],
+            "jpg_order": [1, 1],
+            "ctype": ["LINEAR", "LINEAR"],
+        }
+        exposure.set_detpars(detector_bcspec)
 
     # instrument
-    instrument = BCSpecInstrument()
+    def setup_instrument():
+        from azcam_bcspec.instrument_bcspec import BCSpecInstrument
+
+        instrument = BCSpecInstrument()
 
     # telescope
-    telescope = BokTCS()
+    def setup_telescope():
+        from azcam_bcspec.telescope_bok import BokTCS
+
+        telescope = BokTCS()
+
+    # device I/O metrics
+    def setup_metrics():
+        from azcam_bcspec.metrics import BCSpecMetrics
+
+        metrics = BCSpecMetrics()
+
+    # calibration sequences
+    def setup_calibrations():
+        from azcam_bcspec.calibrations import CalibrationSequence
+
+        calibrations = CalibrationSequence()
 
     # system header template
-    template = os.path.join(
-        azcam.db.datafolder, "templates", "fits_template_bcspec_master.txt"
-    )
-    system = System("bcspec", template)
-    system.set_keyword("DEWAR", "bcspec", "Dewar name")
+    def setup_system():
+        from azcam.header import System
+
+        template = os.path.join(
+            azcam.db.datafolder, "templates", "fits_template_bcspec_master.txt"
+        )
+        system = System("bcspec", template)
+        system.set_keyword("DEWAR", "bcspec", "Dewar name")
 
     # display
-    display = Ds9Display()
-    display.initialize()
+    def setup_display():
+        from azcam.tools.ds9display import Ds9Display
+
+        display = Ds9Display()
+        display.initialize()
 
     # par file
-    azcam.db.parameters.read_parfile(parfile)
-    azcam.db.parameters.update_pars()
+    def setup_pars():
+        azcam.db.parameters.read_parfile(parfile)
+        azcam.db.parameters.update_pars()
 
     # define and start command server
-    cmdserver = CommandServer()
-    cmdserver.port = 2452
-    azcam.log(f"Starting cmdserver - listening on port {cmdserver.port}")
-    azcam.db.api.initialize()
-    cmdserver.start()
+    def setup_api():
+        azcam.db.api.initialize()
+
+    def setup_cmdserver():
+        from azcam.cmdserver import CommandServer
+
+        cmdserver = CommandServer()
+        cmdserver.port = 2452
+        azcam.log(f"Starting cmdserver - listening on port {cmdserver.port}")
+        cmdserver.start()
 
     # web server
-    webserver = WebServer()
-    webserver.logcommands = 0
-    webserver.port = 2403  # common port for all configurations
-    webserver.start()
+    def setup_webserver():
+        from azcam.web.fastapi_server import WebServer
 
-    # azcammonitor
-    azcam.db.monitor.register()
+        webserver = WebServer()
+        webserver.logcommands = 0
+        webserver.port = 2403  # common port for all configurations
+        webserver.start()
+
+        # device metrics at /bcspec/metrics and host health at /bcspec/health
+        azcam.db.tools["metrics"].add_web_route(webserver)
+
+    # azcammonitor, which gets device metrics and host health from the metrics tool
+    def setup_monitor():
+        azcam.db.monitor.register()
 
     # GUI
-    if 1:
-        import azcam_bcspec.start_azcamtool
+    def setup_gui():
+        if 1:
+            import azcam_bcspec.start_azcamtool
+
+    # tools are created in parallel and pars are read once all tools exist,
+    # exposure detpars need the controller and the System header sets the exposure's
+    # image header file
+    tools = [
+        "controller",
+        "tempcon",
+        "exposure",
+        "instrument",
+        "telescope",
+        "metrics",
+        "calibrations",
+        "header templates",
+        "display",
+    ]
+    scheduler = StartupScheduler(profiler)
+    scheduler.add("controller", setup_controller)
+    scheduler.add("tempcon", setup_tempcon)
+    scheduler.add("exposure", setup_exposure, after=["controller"])
+    scheduler.add("instrument", setup_instrument)
+    scheduler.add("telescope", setup_telescope)
+    scheduler.add("metrics", setup_metrics)
+    scheduler.add("calibrations", setup_calibrations)
+    scheduler.add("header templates", setup_system, after=["exposure"])
+    scheduler.add("display", setup_display)
+    scheduler.add("par file", setup_pars, after=tools)
+    scheduler.add("api", setup_api, after=["par file"])
+    scheduler.add("cmdserver", setup_cmdserver, after=["api"])
+    scheduler.add("webserver", setup_webserver, after=["api"])
+    scheduler.add("monitor", setup_monitor, after=["cmdserver", "webserver"])
+    scheduler.add("gui", setup_gui, after=["cmdserver"])
+    try:
+        scheduler.run()
+    finally:
+        # image headers are written and tools are initialized and reset
+        # in the same order as a sequential setup
+        azcam.db.headerorder[:] = sort_by_order(azcam.db.headerorder, HEADER_ORDER)
+        for tools in [azcam.db.tools_init, azcam.db.tools_reset]:
+            items = {name: tools[name] for name in sort_by_order(tools, TOOL_ORDER)}
+            tools.clear()
+            tools.update(items)
 
     # finish
+    profiler.report()
+    scheduler.report()
     azcam.log("Configuration complete")
 
 
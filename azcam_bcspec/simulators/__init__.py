@@ -0,0 +1,3 @@
+"""
+Local stand-in servers for the bcspec device clients.
+"""
@@ -0,0 +1,228 @@
+# Contains the BokpopSimulator class, a local stand-in for the bokpop weather/telemetry server.
+
+import json
+import random
+import socketserver
+import threading
+import time
+
+
+def make_payload(stations=0, depth=2, seed=None):
+    """
+    Returns a nested dict like the bokpop "all" reply.
+    stations is the number of extra weather stations, each nested depth levels deep,
+    which are placed before the standard weather and telemetry groups.
+    """
+
+    rand = random.Random(seed)
+
+    def num(low, high, ndigits=1):
+        return round(rand.uniform(low, high), ndigits)
+
+    payload = {}
+
+    for i in range(stations):
+        station = {
+            f"ws{i}_temp": num(20, 80),
+            f"ws{i}_humid": num(5, 95),
+            f"ws{i}_dewpoint": num(-10, 50),
+            f"ws{i}_pressure": num(780, 800),
+            f"ws{i}_timestamp": "2026-10-17T03:12:45",
+        }
+        for level in range(depth - 1, 0, -1):
+            station = {f"level{level}": station, f"ws{i}_status": "ok"}
+        payload[f"station{i}"] = station
+
+    payload["weather"] = {
+        "udome": {
+            "udome_dewpoint": num(-10, 50),
+            "udome_temp": num(20, 80),
+            "udome_humid": num(5, 95),
+            "timestamp": "2026-10-17T03:12:45",
+        },
+        "inside": {
+            "indewpoint": num(-10, 50),
+            "inhumid": num(5, 95),
+            "intemp": num(40, 75),
+        },
+        "outside": {
+            "outdewpoint": num(-10, 50),
+            "outhumid": num(5, 95),
+            "outtemp": num(20, 90),
+            "wind_speed": str(num(0, 40)),
+            "wind_direction": str(num(0, 359, 0)),
+        },
+        "mcell": {
+            "mcell_dewpoint": num(-10, 50),
+            "mcell_humid": num(5, 95),
+            "mcell_temp": num(30, 70),
+        },
+    }
+
+    payload["telemetry"] = {
+        "airmass": str(num(1.0, 3.0, 3)),
+        "azimuth": str(num(0, 360, 2)),
+        "declination": "+31:57:48.0",
+        "dome": str(num(0, 360, 1)),
+        "elevation": str(num(20, 90, 2)),
+        "epoch": "2000.0",
+        "hour_angle": "-01:23:45.6",
+        "iis": str(num(0, 360, 1)),
+        "julian_date": "2460601.63385",
+        "motion": "0",
+        "right_ascension": "12:34:56.78",
+        "sidereal_time": "11:11:11.2",
+        "universal_time": "03:12:45",
+        "wobble": "0",
+    }
+
+    return payload
+
+
+class BokpopSimulator(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for the bokpop server.
+    Answers each "all" request with a make_payload(stations, depth) JSON document.
+    Replies can be sent in drip byte segments drip_delay seconds apart, and a drop_rate
+    fraction of requests is answered by closing the connection after drop_bytes bytes.
+    Usage: sim = BokpopSimulator(); sim.start(); ...; sim.stop()
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, stations=0, depth=2, seed=None):
+        super().__init__((host, port), BokpopHandler)
+
+        self.host, self.port = self.server_address[:2]
+
+        # payload size and shape, a new payload is made for each request if seed is None
+        self.stations = stations
+        self.depth = depth
+        self.seed = seed
+
+        # reply timing
+        self.latency = 0.0
+        self.drip = 0
+        self.drip_delay = 0.001
+
+        # dropped connections
+        self.drop_rate = 0.0
+        self.drop_bytes = 0
+        self.random = random.Random(seed)
+
+        # statistics
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.open_connections = 0
+        self.requests = 0
+        self.drops = 0
+
+        self.thread = None
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+
+        self.thread = threading.Thread(
+            target=self.serve_forever, name="bokpopsimulator"
+        )
+        self.thread.daemon = True
+        self.thread.start()
+
+        return
+
+    def stop(self):
+        """
+        Stop serving and close the listening socket.
+        """
+
+        self.shutdown()
+        self.server_close()
+
+        return
+
+    def reply(self, request):
+        """
+        Returns the reply bytes for a request.
+        """
+
+        if request.strip() != "all":
+            return b"{}"
+
+        payload = make_payload(self.stations, self.depth, self.seed)
+
+        return str.encode(json.dumps(payload))
+
+    def send_reply(self, sock, reply):
+        """
+        Send a reply with the configured latency, drip and drops.
+        Returns False if the connection was dropped.
+        """
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        with self.lock:
+            drop = self.drop_rate > 0 and self.random.random() < self.drop_rate
+            if drop:
+                self.drops += 1
+
+        if drop:
+            if self.drop_bytes > 0:
+                sock.sendall(reply[: self.drop_bytes])
+            return False
+
+        if self.drip <= 0:
+            sock.sendall(reply)
+            return True
+
+        for i in range(0, len(reply), self.drip):
+            if i > 0:
+                time.sleep(self.drip_delay)
+            sock.sendall(reply[i : i + self.drip])
+
+        return True
+
+
+class BokpopHandler(socketserver.BaseRequestHandler):
+    """
+    Handles one client connection to the simulator.
+    """
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            server.open_connections += 1
+
+        try:
+            rxbuffer = bytearray()
+            while True:
+                index = rxbuffer.find(b"\n")
+                if index < 0:
+                    try:
+                        data = self.request.recv(1024)
+                    except OSError:
+                        break
+                    if not data:
+                        break
+                    rxbuffer += data
+                    continue
+
+                request = rxbuffer[:index].decode()
+                del rxbuffer[: index + 1]
+                with server.lock:
+                    server.requests += 1
+
+                try:
+                    if not server.send_reply(self.request, server.reply(request)):
+                        break
+                except OSError:
+                    break
+        finally:
+            with server.lock:
+                server.open_connections -= 1
+
+        return
@@ -0,0 +1,168 @@
+# Contains the Opto22Simulator class, a local stand-in for the B&C instrument server.
+
+import random
+import socketserver
+import threading
+import time
+
+# lamp names known to the server, same as BCSpecInstrument.Lamps
+LAMPS = ["NEON", "CONT", "UV", "HE/AR", "FE/NE", "UNDEF", "MIRROR", "SPARE"]
+
+
+class Opto22Simulator(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for J. Fookson's Ruby Opto22 instrument server.
+    Sends a banner on connect, replies to each command and closes on CLIENTDONE.
+    Implements INITOPTO and ONLAMP/OFFLAMP for each lamp, valid replies start with "OK: "
+    and errors with "?: ".
+    Replies can be delayed by latency plus random jitter seconds, and by command_delays
+    seconds for individual commands (e.g. {"INITOPTO": 0.5}).
+    Usage: sim = Opto22Simulator(); sim.start(); ...; sim.stop()
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), Opto22Handler)
+
+        self.host, self.port = self.server_address[:2]
+
+        self.banner = "Opto22 instrument server ready"
+
+        # reply timing
+        self.latency = 0.0
+        self.jitter = 0.0
+        self.banner_delay = 0.0
+        self.command_delays = {}
+
+        # opto22 state, lamp_times are the time.time() each lamp was last turned on
+        self.lock = threading.Lock()
+        self.initialized = 0
+        self.lamps = {lamp: 0 for lamp in LAMPS}
+        self.lamp_times = {lamp: None for lamp in LAMPS}
+
+        # number of commands received and the lamp commands in order
+        self.commands = 0
+        self.history = []
+
+        self.thread = None
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+
+        self.thread = threading.Thread(
+            target=self.serve_forever, name="opto22simulator"
+        )
+        self.thread.daemon = True
+        self.thread.start()
+
+        return
+
+    def stop(self):
+        """
+        Stop serving and close the listening socket.
+        """
+
+        self.shutdown()
+        self.server_close()
+
+        return
+
+    def reply(self, command):
+        """
+        Returns the reply string for a command.
+        """
+
+        tokens = command.split(None, 1)
+        if len(tokens) == 0:
+            return "?: empty command"
+        name = tokens[0].upper()
+
+        delay = self.command_delays.get(name, 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+        with self.lock:
+            if name == "INITOPTO":
+                self.initialized = 1
+                for lamp in self.lamps:
+                    self.lamps[lamp] = 0
+                    self.lamp_times[lamp] = None
+                return "OK: %s" % command
+
+            if name in ["ONLAMP", "OFFLAMP"]:
+                if len(tokens) < 2:
+                    return "?: %s needs a lamp name" % name
+                lamp = tokens[1].strip().upper()
+                if lamp not in self.lamps:
+                    return "?: invalid lamp %s" % lamp
+                state = 1 if name == "ONLAMP" else 0
+                if state and not self.lamps[lamp]:
+                    self.lamp_times[lamp] = time.time()
+                elif not state:
+                    self.lamp_times[lamp] = None
+                self.lamps[lamp] = state
+                self.history.append("%s %s" % (name, lamp))
+                return "OK: %s" % command
+
+        return "?: unknown command %s" % command
+
+    def get_lamps_on(self):
+        """
+        Returns the list of lamps which are on.
+        """
+
+        with self.lock:
+            return [lamp for lamp in LAMPS if self.lamps[lamp]]
+
+    def send_reply(self, sock, reply):
+        """
+        Send a reply line after the configured latency and jitter.
+        """
+
+        delay = self.latency + random.uniform(0.0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        sock.sendall(str.encode(reply + "\r\n"))
+
+        return
+
+
+class Opto22Handler(socketserver.BaseRequestHandler):
+    """
+    Handles one client connection to the simulator.
+    """
+
+    def handle(self):
+        if self.server.banner_delay > 0:
+            time.sleep(self.server.banner_delay)
+        try:
+            self.request.sendall(str.encode(self.server.banner + "\r\n"))
+        except OSError:
+            return
+
+        while True:
+            try:
+                data = self.request.recv(1024)
+            except OSError:
+                break
+            if not data:
+                break
+
+            command = data.decode().strip()
+            self.server.commands += 1
+
+            try:
+                if command == "CLIENTDONE":
+                    self.request.sendall(b"OK: bye\r\n")
+                    break
+
+                self.server.send_reply(self.request, self.server.reply(command))
+            except OSError:
+                break
+
+        return
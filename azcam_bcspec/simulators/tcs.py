@@ -0,0 +1,355 @@
+# Contains the BokTCSSimulator class, a local stand-in for the Bok TCS telescope server.
+
+import math
+import random
+import socket
+import socketserver
+import threading
+import time
+
+# REQUEST ALL record fields as [TCS name, column, width]
+RECORD_FIELDS = [
+    ["MOTION", 0, 1],
+    ["RA", 3, 9],
+    ["DEC", 13, 9],
+    ["HA", 24, 9],
+    ["ST", 34, 8],
+    ["EL", 43, 5],
+    ["AZ", 49, 6],
+    ["SECZ", 56, 5],
+    ["EQ", 75, 7],
+    ["JD", 84, 9],
+    ["ROT", 128, 5],
+]
+RECORD_LENGTH = 148
+
+
+class BokTCSSimulator(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for the Bok TCS telescope server.
+    Speaks the "BOK TCS 001 ..." packet protocol: REQUEST ALL, REQUEST <keyword>, EPOCH,
+    NEXTRA, NEXTDEC, MOVNEXT, RADECGUIDE and CANCEL. MOVNEXT and RADECGUIDE start a simulated
+    slew during which the MOTION bit is set.
+    Replies can be delayed by latency plus random jitter seconds and split into fragment byte
+    segments sent fragment_delay seconds apart.
+    Usage: sim = BokTCSSimulator(); sim.start(); ...; sim.stop()
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    # Bok site latitude and longitude in degrees
+    latitude = 31.0 + 57.8 / 60.0
+    longitude = -(111.0 + 36.0 / 60.0)
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), TCSHandler)
+
+        self.host, self.port = self.server_address[:2]
+
+        # reply timing
+        self.latency = 0.0
+        self.jitter = 0.0
+        self.fragment = 0
+        self.fragment_delay = 0.001
+
+        # close the connection after each reply, like a one packet per connection server
+        self.close_after_reply = 0
+
+        # slews
+        self.slew_rate = 2.0  # degrees per second
+        self.min_slew_time = 1.0  # seconds
+        self.guide_time = 0.5  # seconds
+
+        # telescope state, RA in hours and DEC in degrees
+        self.lock = threading.Lock()
+        self.ra = 12.0
+        self.dec = 30.0
+        self.epoch = 2000.0
+        self.next_ra = self.ra
+        self.next_dec = self.dec
+        self.rotator = 90.0
+        self.slew = None  # [start time, end time, start ra, start dec, end ra, end dec]
+        self.last_slew_time = 0.0
+
+        # statistics
+        self.connections = 0
+        self.packets = {}
+
+        self.thread = None
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+
+        self.thread = threading.Thread(target=self.serve_forever, name="tcssimulator")
+        self.thread.daemon = True
+        self.thread.start()
+
+        return
+
+    def stop(self):
+        """
+        Stop serving and close the listening socket.
+        """
+
+        self.shutdown()
+        self.server_close()
+
+        return
+
+    # **************************************************************************************************
+    # telescope state
+    # **************************************************************************************************
+
+    def update(self):
+        """
+        Advance the simulated slew, returns the MOTION bit.
+        """
+
+        if self.slew is None:
+            return 0
+
+        t0, t1, ra0, dec0, ra1, dec1 = self.slew
+        now = time.monotonic()
+        if now >= t1:
+            self.ra, self.dec = ra1, dec1
+            self.slew = None
+            return 0
+
+        f = (now - t0) / (t1 - t0)
+        self.ra = ra0 + (ra1 - ra0) * f
+        self.dec = dec0 + (dec1 - dec0) * f
+
+        return 1
+
+    def start_slew(self, ra, dec, duration=None):
+        """
+        Start a slew to ra (hours), dec (degrees).
+        """
+
+        if duration is None:
+            dra = abs(ra - self.ra) * 15.0 * math.cos(math.radians(self.dec))
+            distance = math.hypot(dra, dec - self.dec)
+            duration = max(self.min_slew_time, distance / self.slew_rate)
+
+        now = time.monotonic()
+        self.slew = [now, now + duration, self.ra, self.dec, ra % 24.0, dec]
+        self.last_slew_time = duration
+
+        return
+
+    def telemetry(self):
+        """
+        Returns a dictionary of current TCS values as formatted strings.
+        """
+
+        with self.lock:
+            motion = self.update()
+            ra, dec = self.ra, self.dec
+
+        jd = time.time() / 86400.0 + 2440587.5
+        lst = (18.697374558 + 24.06570982441908 * (jd - 2451545.0)) % 24.0
+        lst = (lst + self.longitude / 15.0) % 24.0
+        ha = (lst - ra + 12.0) % 24.0 - 12.0
+
+        # elevation and azimuth from hour angle and declination
+        lat = math.radians(self.latitude)
+        h = math.radians(ha * 15.0)
+        d = math.radians(dec)
+        sin_el = math.sin(lat) * math.sin(d) + math.cos(lat) * math.cos(d) * math.cos(h)
+        el = math.degrees(math.asin(max(-1.0, min(1.0, sin_el))))
+        az = math.degrees(
+            math.atan2(
+                -math.cos(d) * math.sin(h),
+                math.sin(d) * math.cos(lat) - math.cos(d) * math.cos(h) * math.sin(lat),
+            )
+        )
+        secz = 1.0 / sin_el if sin_el > 0.1 else 9.999
+
+        values = {
+            "MOTION": str(motion),
+            "RA": _sexagesimal(ra, 2, 2, "", False),
+            "DEC": _sexagesimal(dec, 2, 1, "", True),
+            "HA": _sexagesimal(ha, 2, 0, ":", True),
+            "ST": _sexagesimal(lst, 2, 0, ":", False),
+            "EL": "%5.2f" % el,
+            "AZ": "%6.2f" % (az % 360.0),
+            "SECZ": "%5.3f" % min(secz, 9.999),
+            "EQ": "%7.2f" % self.epoch,
+            "JD": "%9.1f" % jd,
+            "ROT": "%5.1f" % self.rotator,
+        }
+
+        return values
+
+    def record(self):
+        """
+        Returns one REQUEST ALL telemetry record.
+        """
+
+        values = self.telemetry()
+        record = [" "] * RECORD_LENGTH
+        for name, column, width in RECORD_FIELDS:
+            record[column : column + width] = values[name][:width].rjust(width)
+
+        return "".join(record)
+
+    # **************************************************************************************************
+    # packets
+    # **************************************************************************************************
+
+    def reply(self, packet):
+        """
+        Returns the reply bytes for one packet.
+        """
+
+        tokens = packet.split()
+        if len(tokens) < 4 or tokens[0] != "BOK" or tokens[1] != "TCS":
+            return b"BOK TCS 001 ?\n"
+        pid = tokens[2]
+        command = tokens[3].upper()
+        args = tokens[4:]
+
+        self.packets[command] = self.packets.get(command, 0) + 1
+
+        if command == "REQUEST":
+            if args[:1] == ["ALL"]:
+                return str.encode("BOKTCS%s " % pid + self.record()) + b"\xff\n"
+            values = self.telemetry()
+            if args and args[0] in values:
+                return str.encode("BOK TCS %s %s\n" % (pid, values[args[0]]))
+            return str.encode("BOK TCS %s ?\n" % pid)
+
+        with self.lock:
+            try:
+                if command == "EPOCH":
+                    self.epoch = float(args[0])
+                elif command == "NEXTRA":
+                    self.next_ra = _parse_sexagesimal(args[0], 2)
+                elif command == "NEXTDEC":
+                    self.next_dec = _parse_sexagesimal(args[0], 3)
+                elif command == "MOVNEXT":
+                    self.update()
+                    self.start_slew(self.next_ra, self.next_dec)
+                elif command == "RADECGUIDE":
+                    self.update()
+                    dra = float(args[0]) / 3600.0 / 15.0
+                    ddec = float(args[1]) / 3600.0
+                    self.start_slew(
+                        self.ra + dra / max(0.01, math.cos(math.radians(self.dec))),
+                        self.dec + ddec,
+                        self.guide_time,
+                    )
+                elif command == "CANCEL":
+                    self.update()
+                    self.slew = None
+                else:
+                    return str.encode("BOK TCS %s ?\n" % pid)
+            except (IndexError, ValueError):
+                return str.encode("BOK TCS %s ?\n" % pid)
+
+        return str.encode("BOK TCS %s OK\n" % pid)
+
+    def send_reply(self, sock, reply):
+        """
+        Send a reply with the configured latency, jitter and fragmentation.
+        """
+
+        delay = self.latency + random.uniform(0.0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.fragment <= 0:
+            sock.sendall(reply)
+            return
+
+        for i in range(0, len(reply), self.fragment):
+            if i > 0:
+                time.sleep(self.fragment_delay)
+            sock.sendall(reply[i : i + self.fragment])
+
+        return
+
+
+class TCSHandler(socketserver.BaseRequestHandler):
+    """
+    Handles one client connection to the simulator.
+    """
+
+    def handle(self):
+        self.server.connections += 1
+
+        # fragments are sent as separate segments without waiting for ACKs
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        rxbuffer = bytearray()
+        while True:
+            index = rxbuffer.find(b"\n")
+            if index < 0:
+                try:
+                    data = self.request.recv(1024)
+                except OSError:
+                    break
+                if not data:
+                    break
+                rxbuffer += data
+                continue
+
+            packet = rxbuffer[:index].decode().strip()
+            del rxbuffer[: index + 1]
+
+            try:
+                self.server.send_reply(self.request, self.server.reply(packet))
+            except OSError:
+                break
+
+            if self.server.close_after_reply:
+                break
+
+        return
+
+
+def _sexagesimal(value, digits, precision, sep, sign):
+    """
+    Format a value as [+-]dd[sep]mm[sep]ss[.s].
+    """
+
+    s = "-" if value < 0 else "+"
+    scale = 10**precision
+    total = int(round(abs(value) * 3600.0 * scale))
+    seconds = total % (60 * scale)
+    minutes = (total // (60 * scale)) % 60
+    degrees = total // (3600 * scale)
+
+    width = 2 + (precision + 1 if precision else 0)
+    if precision:
+        ss = "%0*.*f" % (width, precision, seconds / scale)
+    else:
+        ss = "%02d" % seconds
+
+    text = "%0*d%s%02d%s%s" % (digits, degrees, sep, minutes, sep, ss)
+    if sign:
+        text = s + text
+
+    return text
+
+
+def _parse_sexagesimal(text, digits):
+    """
+    Parse [+-]ddmmss.s or dd:mm:ss.s (digits is the width of dd including any sign).
+    """
+
+    text = text.strip()
+    if ":" in text:
+        parts = text.split(":")
+    elif "." in text and text.index(".") <= digits:
+        return float(text)  # decimal value
+    else:
+        parts = [text[:digits], text[digits : digits + 2], text[digits + 2 :]]
+
+    sign = -1.0 if parts[0].startswith("-") else 1.0
+    value = abs(float(parts[0])) + float(parts[1]) / 60.0 + float(parts[2]) / 3600.0
+
+    return sign * value
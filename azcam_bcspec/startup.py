@@ -0,0 +1,402 @@
+# Contains the StartupProfiler and StartupScheduler classes and connect_server(),
+# used by system setup() functions.
+
+import contextlib
+import socket
+import threading
+import time
+
+
+class StartupProfiler(object):
+    """
+    Records the time spent in each phase of system setup and logs a report.
+    Only the standard library is imported so the profiler can be created before azcam.
+    Usage example:
+      profiler = StartupProfiler("server")
+      ...imports...
+      profiler.mark("imports")
+      with profiler.phase("controller"):
+          ...
+      profiler.report()
+    Phases may be timed from several threads at once, as by StartupScheduler.
+    """
+
+    def __init__(self, name="startup", budget=None):
+        self.name = name
+
+        # optional time budget in seconds for each phase, "total" is for all phases
+        self.budget = {} if budget is None else dict(budget)
+
+        # list of [phase name, start time, seconds], start time relative to t0
+        self.phases = []
+
+        self.t0 = time.perf_counter()
+        self.last_mark = self.t0
+
+        # phases and last_mark are changed from startup task threads
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Context manager which times one phase.
+        """
+
+        t0 = time.perf_counter()
+        try:
+            yield self
+        finally:
+            t1 = time.perf_counter()
+            with self.lock:
+                self.phases.append([name, t0 - self.t0, t1 - t0])
+                self.last_mark = max(self.last_mark, t1)
+
+    def mark(self, name):
+        """
+        Record a phase which started at the previous mark or phase end.
+        """
+
+        t1 = time.perf_counter()
+        with self.lock:
+            self.phases.append([name, self.last_mark - self.t0, t1 - self.last_mark])
+            self.last_mark = t1
+
+        return
+
+    def get_times(self):
+        """
+        Returns a dictionary of seconds spent in each phase, in phase order.
+        """
+
+        with self.lock:
+            phases = list(self.phases)
+
+        times = {}
+        for name, start, seconds in phases:
+            times[name] = times.get(name, 0.0) + seconds
+
+        return times
+
+    def get_total(self):
+        """
+        Returns seconds from the start of the earliest phase to the end of the latest one.
+        Phases which ran at the same time are counted once.
+        """
+
+        with self.lock:
+            phases = list(self.phases)
+        if not phases:
+            return 0.0
+
+        start = min(phase[1] for phase in phases)
+        end = max(phase[1] + phase[2] for phase in phases)
+
+        return end - start
+
+    def get_report(self):
+        """
+        Returns the report as a list of lines.
+        """
+
+        times = self.get_times()
+        total = self.get_total()
+        width = max([len(name) for name in times] + [5])
+
+        lines = [f"{self.name} startup times (s):"]
+        for name, seconds in times.items():
+            percent = 100.0 * seconds / total if total > 0 else 0.0
+            line = f"  {name:<{width}} {seconds:7.3f} {percent:5.1f}%"
+            budget = self.budget.get(name)
+            if budget is not None and seconds > budget:
+                line += f"  over budget of {budget:.3f}"
+            lines.append(line)
+
+        line = f"  {'total':<{width}} {total:7.3f}"
+        budget = self.budget.get("total")
+        if budget is not None and total > budget:
+            line += f"  over budget of {budget:.3f}"
+        lines.append(line)
+
+        return lines
+
+    def report(self):
+        """
+        Log the startup report.
+        """
+
+        import azcam
+
+        for line in self.get_report():
+            azcam.log(line)
+
+        return
+
+
+class StartupScheduler(object):
+    """
+    Runs startup tasks in parallel threads, each as soon as the tasks it depends on are done.
+    Task times are recorded in a StartupProfiler and the critical path is reported.
+    Usage example:
+      scheduler = StartupScheduler(profiler)
+      scheduler.add("controller", setup_controller)
+      scheduler.add("par file", read_pars, after=["controller"])
+      scheduler.add("display", start_display, background=True)
+      scheduler.run()
+    Background tasks are started with the others but run() does not wait for them.
+    """
+
+    def __init__(self, profiler=None):
+        self.profiler = StartupProfiler() if profiler is None else profiler
+
+        # task name : dictionary of function, after, start, end, status, error
+        self.tasks = {}
+
+        self.condition = threading.Condition()
+
+    def add(self, name, function, after=None, background=False):
+        """
+        Add a task which runs function() after all tasks named in after are done.
+        If background is True, run() does not wait for the task and no task may depend on it.
+        """
+
+        self.tasks[name] = {
+            "function": function,
+            "after": [] if after is None else list(after),
+            "background": background,
+            "start": None,
+            "end": None,
+            "status": "pending",
+            "error": None,
+        }
+
+        return
+
+    def run(self):
+        """
+        Run all tasks and wait for them to finish.
+        Tasks which depend on a failed task are skipped.
+        The first task error is raised after all other tasks have finished.
+        """
+
+        import azcam
+        import azcam.exceptions
+
+        for name, task in self.tasks.items():
+            for dependency in task["after"]:
+                if dependency not in self.tasks:
+                    raise azcam.exceptions.AzcamError(
+                        f"startup task {name} depends on unknown task {dependency}"
+                    )
+                if self.tasks[dependency]["background"]:
+                    raise azcam.exceptions.AzcamError(
+                        f"startup task {name} depends on background task {dependency}"
+                    )
+
+        with self.condition:
+            while True:
+                pending = [
+                    name
+                    for name, task in self.tasks.items()
+                    if task["status"] == "pending"
+                ]
+                running = [
+                    name
+                    for name, task in self.tasks.items()
+                    if task["status"] == "running" and not task["background"]
+                ]
+                if not pending and not running:
+                    break
+
+                started = 0
+                for name in pending:
+                    task = self.tasks[name]
+                    states = [self.tasks[d]["status"] for d in task["after"]]
+                    if any(state in ["failed", "skipped"] for state in states):
+                        task["status"] = "skipped"
+                        started += 1
+                    elif all(state == "done" for state in states):
+                        task["status"] = "running"
+                        thread = threading.Thread(
+                            target=self._run_task,
+                            name=f"startup_{name}",
+                            args=[name],
+                        )
+                        thread.daemon = True
+                        thread.start()
+                        started += 1
+
+                if started == 0 and not running:
+                    raise azcam.exceptions.AzcamError(
+                        f"startup tasks have circular dependencies: {pending}"
+                    )
+
+                if started == 0:
+                    self.condition.wait()
+
+        for name, task in self.tasks.items():
+            if task["status"] == "skipped":
+                azcam.log(f"startup task {name} skipped after an earlier failure")
+
+        for name, task in self.tasks.items():
+            if task["error"] is not None and not task["background"]:
+                raise task["error"]
+
+        return
+
+    def _run_task(self, name):
+        """
+        Startup task thread.
+        """
+
+        task = self.tasks[name]
+
+        try:
+            with self.profiler.phase(name) as profiler:
+                task["start"] = time.perf_counter() - profiler.t0
+                task["function"]()
+            status = "done"
+        except Exception as e:
+            task["error"] = e
+            status = "failed"
+            if task["background"]:
+                import azcam
+
+                azcam.log(f"startup task {name} failed: {e}")
+
+        with self.condition:
+            task["end"] = time.perf_counter() - self.profiler.t0
+            task["status"] = status
+            self.condition.notify_all()
+
+        return
+
+    def get_critical_path(self):
+        """
+        Returns the list of task names on the critical path, ending with the last task to finish.
+        Background tasks are not included. Each task on the path is preceded by the dependency which finished last.
+        """
+
+        finished = [
+            name
+            for name, task in self.tasks.items()
+            if task["end"] is not None and not task["background"]
+        ]
+        if not finished:
+            return []
+
+        name = max(finished, key=lambda n: self.tasks[n]["end"])
+        path = [name]
+        while True:
+            after = [d for d in self.tasks[name]["after"] if self.tasks[d]["end"]]
+            if not after:
+                break
+            name = max(after, key=lambda n: self.tasks[n]["end"])
+            path.insert(0, name)
+
+        return path
+
+    def get_report(self):
+        """
+        Returns the critical path report as a list of lines.
+        """
+
+        path = self.get_critical_path()
+        if not path:
+            return []
+
+        finished = [
+            task
+            for task in self.tasks.values()
+            if task["end"] is not None and not task["background"]
+        ]
+        wall = max(task["end"] for task in finished) - min(
+            task["start"] for task in finished
+        )
+        serial = sum(task["end"] - task["start"] for task in finished)
+        lines = [
+            "startup critical path (s): "
+            + " > ".join(
+                f"{name} {self.tasks[name]['end'] - self.tasks[name]['start']:.3f}"
+                for name in path
+            ),
+            f"  parallel tasks took {wall:.3f}, " f"{serial:.3f} if run in sequence",
+        ]
+
+        return lines
+
+    def report(self):
+        """
+        Log the critical path report.
+        """
+
+        import azcam
+
+        for line in self.get_report():
+            azcam.log(line)
+
+        return
+
+
+def server_listening(host, port, timeout):
+    """
+    Returns "" if a connection to host:port can be opened within timeout seconds,
+    otherwise the error message.
+    """
+
+    try:
+        with socket.create_connection((host, int(port)), timeout):
+            return ""
+    except OSError as e:
+        return str(e) or type(e).__name__
+
+
+def connect_server(connect, host, port, timeout=2.0, retry=5.0, retries=120):
+    """
+    Connect to a server with connect(), which returns True if connected.
+    connect() is only called once host:port accepts a connection within timeout seconds.
+    If the first attempt fails the reason is logged and a background thread tries again
+    every retry seconds up to retries times.
+    Returns True if connected on the first attempt.
+    """
+
+    import azcam
+
+    def attempt():
+        error = server_listening(host, port, timeout)
+        if error:
+            return error
+        try:
+            if connect():
+                return ""
+        except Exception as e:
+            return str(e)
+        return "connect failed"
+
+    error = attempt()
+    if not error:
+        azcam.log(f"Connected to azcamserver at {host}:{port}")
+        return True
+
+    azcam.log(
+        f"Not connected to azcamserver at {host}:{port} ({error}), "
+        f"trying again every {retry:.0f} s in background"
+    )
+
+    def reconnect():
+        error = ""
+        for _ in range(retries):
+            time.sleep(retry)
+            error = attempt()
+            if not error:
+                azcam.log(f"Connected to azcamserver at {host}:{port}")
+                return
+        azcam.log(
+            f"Could not connect to azcamserver at {host}:{port} "
+            f"after {retries} retries ({error})"
+        )
+
+    thread = threading.Thread(target=reconnect, name="connect_azcamserver")
+    thread.daemon = True
+    thread.start()
+
+    return False
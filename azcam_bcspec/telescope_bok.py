@@ -1,14 +1,18 @@
 # Contains the BokTCS class which defines the Bok telescope interface.
 
+import asyncio
+import os
+import select
 import socket
+import threading
 import time
 
-from astropy.coordinates import SkyCoord, EarthLocation, AltAz
-from astropy.time import Time
-
 import azcam
 import azcam.exceptions
 from azcam.tools.telescope import Telescope
+from azcam_bcspec.health import get_breaker
+from azcam_bcspec.metrics import get_device
+from azcam_bcspec.tracing import tracer
 
 
 class BokTCS(Telescope):
@@ -24,6 +28,34 @@ class BokTCS(Telescope):
 
         self.mock = 0
 
+        # seconds before a move is cancelled, and between motion checks
+        self.move_timeout = 600.0
+        self.motion_period = 0.1
+
+        # MotionHandle of the last motion started with start_motion()
+        self.motion = None
+
+        # Az/Alt transform engine
+        self.coordinates = None
+
+        # telemetry snapshot from REQUEST ALL, optionally refreshed by a background poller
+        self.telemetry = ""
+        self.telemetry_time = 0.0  # time.monotonic() when telemetry was read
+        self.telemetry_record = None  # [telemetry, decoded TelemetryRecord]
+        self.telemetry_lock = threading.Lock()
+        self.telemetry_period = 0.2  # seconds between background polls
+        self.telemetry_max_age = 0.5  # default staleness bound while polling
+        self.telemetry_polling = 0
+        self.telemetry_thread = None
+
+        # telemetry sampled at the start, middle and end of each integration
+        self.exposure_sampling = 1
+        self.sample_min_exposure = 1.0  # shorter exposures use the start sample only
+        self.sample_timeout = (
+            2.0  # seconds to wait for samples before the image is written
+        )
+        self.sampler = None  # TelemetrySampler of the current exposure
+
     def initialize(self):
         """
         Initializes the telescope interface.
@@ -50,20 +82,139 @@ class BokTCS(Telescope):
     # exposure
     # **************************************************************************************************
 
+    # keyword : [TCS keyword, sample, comment] set from the exposure telemetry samples
+    sample_keywords = {
+        "AIRM-BEG": ["AIRMASS", "start", "airmass at start of exposure"],
+        "AIRM-MID": ["AIRMASS", "mid", "airmass at middle of exposure"],
+        "AIRM-END": ["AIRMASS", "end", "airmass at end of exposure"],
+        "HA-BEG": ["HA", "start", "hour angle at start of exposure"],
+        "HA-END": ["HA", "end", "hour angle at end of exposure"],
+    }
+
     def exposure_start(self):
         """
         Setup before exposure starts.
+        Starts the exposure timeline trace and background telemetry sampling.
         """
 
+        exposure = azcam.db.tools.get("exposure")
+        try:
+            label = os.path.basename(exposure.get_filename())
+        except Exception:
+            label = ""
+        tracer.start(label)
+
+        for key in self.sample_keywords:
+            self.header.delete_keyword(key)
+
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+
+        if self.exposure_sampling and self.is_enabled and self.is_initialized:
+            self.sampler = TelemetrySampler(self)
+            self.sampler.start()
+
         return
 
     def exposure_finish(self):
         """
-        Setup before exposure starts.
+        Cleanup after exposure finishes.
+        Stops telemetry sampling and finishes the exposure timeline trace.
+        """
+
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+
+        tracer.finish()
+
+        return
+
+    def integration_start(self, exposure_time):
+        """
+        Called when the shutter opens, to sample telemetry at the start and middle of the integration.
+        """
+
+        if self.sampler is not None:
+            self.sampler.integration_start(exposure_time)
+
+        return
+
+    def integration_end(self):
+        """
+        Called when the shutter closes, to sample telemetry at the end of the integration.
         """
 
+        if self.sampler is not None:
+            self.sampler.integration_end()
+
         return
 
+    def update_exposure_header(self, timeout=None):
+        """
+        Set the telescope header from the telemetry sampled during the exposure.
+        Keyword values are from the middle of the exposure, AIRMASS is the effective airmass
+        from the start, middle and end samples.
+        Waits up to timeout seconds for samples still being read.
+        Returns the header list as read_header() does, or None if there are no samples,
+        in which case the header read at the start of the exposure is kept.
+        """
+
+        if self.sampler is None:
+            return None
+
+        if timeout is None:
+            timeout = self.sample_timeout
+        samples = self.sampler.get_samples(timeout)
+        if not samples:
+            azcam.log("no telescope telemetry samples for exposure")
+            return None
+
+        start = samples.get("start")
+        end = samples.get("end", start)
+        mid = samples.get("mid")
+        if mid is None:
+            mid = end if start is None else start
+
+        record = mid
+        for key, message in record.errors:
+            azcam.log("ERROR reading telescope data (%s):" % key, message)
+
+        header = []
+        for key in self.header.get_keywords():
+            if key not in self.Tserver.typestrings:
+                continue
+            list1 = [
+                key,
+                record[key],
+                self.Tserver.comments[key],
+                self.Tserver.typestrings[key],
+            ]
+            header.append(list1)
+
+        airmass = effective_airmass(
+            [samples.get(name) for name in ["start", "mid", "end"]]
+        )
+        if airmass is not None:
+            for list1 in header:
+                if list1[0] == "AIRMASS":
+                    list1[1] = airmass
+                    list1[2] = "effective airmass of exposure"
+
+        for key, (keyword, name, comment) in self.sample_keywords.items():
+            sample = {"start": start, "mid": mid, "end": end}[name]
+            if sample is None:
+                continue
+            header.append(
+                [key, sample[keyword], comment, self.Tserver.typestrings[keyword]]
+            )
+
+        for list1 in header:
+            self.header.set_keyword(list1[0], list1[1], list1[2], list1[3])
+
+        return header
+
     # **************************************************************************************************
     # Keywords
     # **************************************************************************************************
@@ -84,17 +235,35 @@ class BokTCS(Telescope):
 
         return
 
-    def get_keyword(self, keyword):
+    def get_keyword(self, keyword, max_age=None):
         """
         Reads an telescope keyword value.
         Keyword is the name of the keyword to be read.
         This command will read hardware to obtain the keyword value.
+        If max_age is given, or the telemetry poller is running, the value is taken from
+        the telemetry snapshot if it is not older than max_age seconds.
         """
 
         if not self.is_enabled:
             azcam.exceptions.warning("telescope not enabled")
             return
 
+        if max_age is not None or self.telemetry_polling:
+            if keyword not in self.Tserver.keywords:
+                raise azcam.exceptions.AzcamError(f"Keyword {keyword} not defined")
+            reply = self.get_telemetry_record(max_age)
+            if reply[0] != "OK":
+                self.header.set_keyword(keyword, "")
+                return reply
+            reply = reply[1][keyword]
+
+            # store value in Header
+            self.header.set_keyword(keyword, reply)
+
+            reply, t = self.header.convert_type(reply, self.header.typestrings[keyword])
+
+            return [reply, self.Tserver.comments[keyword], t]
+
         try:
             command = self.Tserver.make_packet(
                 "REQUEST " + self.Tserver.keywords[keyword]
@@ -126,12 +295,28 @@ class BokTCS(Telescope):
 
         return [reply, self.Tserver.comments[keyword], t]
 
-    def read_header(self):
+    def read_header(self, max_age=None):
         """
         Reads and returns current header data.
         returns [Header[]]: Each element Header[i] contains the sublist (keyword, value, comment, and type).
         Example: Header[2][1] is the value of keyword 2 and Header[2][3] is its type.
         Type is one of str, int, or float.
+        max_age is the staleness bound in seconds for using the telemetry snapshot.
+        """
+
+        header = self.get_header_data(max_age)
+        if not header or header[0] == "ERROR":
+            return header
+
+        for list1 in header:
+            # store value in Header
+            self.header.set_keyword(list1[0], list1[1], list1[2], list1[3])
+
+        return header
+
+    def get_header_data(self, max_age=None):
+        """
+        Reads and returns current header data as read_header() does, without changing the header.
         """
 
         if not self.is_enabled:
@@ -140,6 +325,34 @@ class BokTCS(Telescope):
 
         header = []
 
+        h = self.get_telemetry(max_age)
+        if h[0] != "OK":
+            return h
+        h = h[1]
+
+        record = self.Tserver.decoder.decode(h)
+        for key, message in record.errors:
+            azcam.log("ERROR reading telescope data (%s):" % key, message)
+
+        for key in self.header.get_keywords():
+            if key not in self.Tserver.typestrings:
+                continue
+            t = self.Tserver.typestrings[key]
+            list1 = [key, record[key], self.Tserver.comments[key], t]
+            header.append(list1)
+
+        return header
+
+    # **************************************************************************************************
+    # Telemetry
+    # **************************************************************************************************
+
+    def read_telemetry(self):
+        """
+        Reads one REQUEST ALL telemetry string from the TCS and saves it as the telemetry snapshot.
+        Returns ["OK", telemetry] or an error reply.
+        """
+
         cmd = self.Tserver.make_packet("REQUEST ALL")
         l1 = (
             len(self.Tserver.TELID) + len(self.Tserver.SYSID) + len(self.Tserver.PID)
@@ -149,23 +362,106 @@ class BokTCS(Telescope):
             return h
         h = h[1][l1 + 1 :]  # strip header stuff
 
-        for key in self.header.get_keywords():
-            t = self.Tserver.typestrings[key]
-            list1 = [
-                key,
-                self.Tserver.parse_keyword(key, h)[1],
-                self.Tserver.comments[key],
-                t,
-            ]
-            header.append(list1)
-            # store value in Header
-            self.header.set_keyword(list1[0], list1[1], list1[2], list1[3])
+        with self.telemetry_lock:
+            self.telemetry = h
+            self.telemetry_time = time.monotonic()
 
-        return header
+        return ["OK", h]
+
+    def get_telemetry(self, max_age=None):
+        """
+        Returns ["OK", telemetry] from the telemetry snapshot if it is not older than max_age seconds,
+        otherwise reads new telemetry from the TCS.
+        If max_age is None the snapshot is only used while the telemetry poller is running.
+        """
+
+        if max_age is None:
+            if not self.telemetry_polling:
+                return self.read_telemetry()
+            max_age = self.telemetry_max_age
+
+        with self.telemetry_lock:
+            if self.telemetry and time.monotonic() - self.telemetry_time <= max_age:
+                return ["OK", self.telemetry]
+
+        return self.read_telemetry()
+
+    def get_telemetry_record(self, max_age=None):
+        """
+        Returns ["OK", TelemetryRecord] for the telemetry from get_telemetry(max_age).
+        Each snapshot is decoded only once.
+        """
+
+        reply = self.get_telemetry(max_age)
+        if reply[0] != "OK":
+            return reply
+
+        with self.telemetry_lock:
+            if (
+                self.telemetry_record is not None
+                and self.telemetry_record[0] is reply[1]
+            ):
+                return ["OK", self.telemetry_record[1]]
+
+        record = self.Tserver.decoder.decode(reply[1])
+        with self.telemetry_lock:
+            self.telemetry_record = [reply[1], record]
+
+        return ["OK", record]
+
+    def start_telemetry_poller(self, period=None):
+        """
+        Start a background thread which reads REQUEST ALL telemetry every period seconds.
+        """
+
+        if period is not None:
+            self.telemetry_period = float(period)
+
+        if self.telemetry_polling:
+            return
+
+        self.telemetry_polling = 1
+        self.telemetry_thread = threading.Thread(
+            target=self._poll_telemetry, name="telemetrypoller"
+        )
+        self.telemetry_thread.daemon = True
+        self.telemetry_thread.start()
+
+        return
+
+    def stop_telemetry_poller(self):
+        """
+        Stop the background telemetry poller.
+        """
+
+        self.telemetry_polling = 0
+        if self.telemetry_thread is not None:
+            self.telemetry_thread.join(timeout=5.0)
+            self.telemetry_thread = None
+
+        return
+
+    def _poll_telemetry(self):
+        """
+        Telemetry poller thread loop.
+        """
+
+        while self.telemetry_polling:
+            t0 = time.monotonic()
+            try:
+                reply = self.read_telemetry()
+                if reply[0] != "OK":
+                    azcam.log(f"telemetry poller: {reply[1]}", level=2)
+            except Exception as e:
+                azcam.log(f"telemetry poller: {e}", level=2)
+            time.sleep(max(0.0, self.telemetry_period - (time.monotonic() - t0)))
+
+        return
 
     def update_header(self):
         """
         Update headers, reading current data.
+        Raises an error if telemetry could not be read, as the header still has old values.
         """
 
         # delete all keywords if not enabled
@@ -174,7 +470,9 @@ class BokTCS(Telescope):
             return
 
         self.define_keywords()
-        self.read_header()
+        reply = self.read_header()
+        if reply and reply[0] == "ERROR":
+            raise azcam.exceptions.AzcamError(reply[1])
 
         return
 
@@ -251,21 +549,10 @@ class BokTCS(Telescope):
         if self.mock == 1:
             return
 
-        # from Griffin
-        obstime = Time.now()
-        location = EarthLocation.of_site(self.location)
-        frame = AltAz(obstime=obstime, location=location)
-
-        target = SkyCoord(azimuth, altitude, unit="deg", frame=frame)
-
-        coord = target.transform_to("icrs")
-
-        ra = coord.ra.to_string(sep="", precision=2, pad=True, unit="hourangle")
-        dec = coord.dec.to_string(sep="", precision=1, pad=True, alwayssign=True)
-        # print(f"RA/DEC: {ra}, {dec}")
-        # print(f"Obstime: {coord.obstime}")
-        # print(f"Azimuth/Altitude: {coord.altaz.az}, {coord.altaz.alt}")
-        # print(f"Location: {coord.location}")
+        # from Griffin, with cached site and frame
+        coords = self.get_coordinates()
+        ra, dec = coords.azalt_to_radec(azimuth, altitude)
+        ra, dec = coords.format_radec(ra[0], dec[0])
 
         replylen = 1024
 
@@ -288,6 +575,64 @@ class BokTCS(Telescope):
 
         return
 
+    def move_azalt_many(self, positions, callback=None):
+        """
+        Moves telescope to a sequence of absolute Az, Alt positions, such as dome flat
+        or pointing grid positions. Units are degrees.
+        positions is a list of [azimuth, altitude]. All positions are transformed in one call
+        and RA is corrected for sidereal motion when each move starts.
+        If given, callback(index, azimuth, altitude) is called after each move, for example
+        to take an exposure.
+        Returns a list of [azimuth, altitude, RA, Dec, status] for each position.
+        """
+
+        if not self.is_enabled:
+            azcam.exceptions.warning("telescope not enabled")
+            return
+
+        Epoch = 2000.0
+
+        azimuths = [float(p[0]) for p in positions]
+        altitudes = [float(p[1]) for p in positions]
+
+        coords = self.get_coordinates()
+        t0 = time.time()
+        ras, decs = coords.azalt_to_radec(azimuths, altitudes)
+
+        results = []
+        for i, (azimuth, altitude) in enumerate(zip(azimuths, altitudes)):
+            ra = coords.drift_ra(ras[i], time.time() - t0)
+            ra, dec = coords.format_radec(ra, decs[i])
+
+            commands = ["EPOCH %s" % Epoch, "NEXTRA %s" % ra, "NEXTDEC %s" % dec]
+            commands.append("MOVNEXT")
+            handle = self.start_motion(commands, "azalt %s %s" % (azimuth, altitude))
+            status = handle.wait()
+            results.append([azimuth, altitude, ra, dec, status])
+
+            if status != "DONE":
+                raise azcam.exceptions.AzcamError(
+                    f"move to Az/Alt {azimuth} {altitude} failed: {status}"
+                )
+
+            if callback is not None:
+                callback(i, azimuth, altitude)
+
+        return results
+
+    def get_coordinates(self):
+        """
+        Returns the BokCoordinates transform engine, created on first use.
+        """
+
+        if self.coordinates is None:
+            # astropy is only imported when a transform is first needed
+            from azcam_bcspec.coordinates_bok import BokCoordinates
+
+            self.coordinates = BokCoordinates()
+
+        return self.coordinates
+
     def move_start(self, RA, Dec, Epoch=2000.0):
         """
         Moves telescope to an absolute RA,DEC position without waiting for motion to stop.
@@ -330,7 +675,7 @@ class BokTCS(Telescope):
 
         count = 0
         while True:
-            reply = self.get_keyword("MOTION")
+            reply = self.get_keyword("MOTION", 0.1)
             try:
                 motion = int(reply[0])
             except Exception:
@@ -362,11 +707,13 @@ class BokTCS(Telescope):
             azcam.log("Did not see telescope MOTION bit go high")
             return
 
-        # loop without timeout
+        # loop until stopped or move_timeout
         azcam.log("Checking for telescope motion...")
         cycle = 0
-        while True:
-            reply = self.get_keyword("MOTION")
+        t0 = time.monotonic()
+        while time.monotonic() - t0 < self.move_timeout:
+            # RA and DEC come from the same telemetry snapshot as MOTION
+            reply = self.get_keyword("MOTION", 0.1)
             try:
                 motion = int(reply[0])
             except Exception:
@@ -374,24 +721,377 @@ class BokTCS(Telescope):
                     "bad MOTION status keyword: %s" % reply
                 )
 
+            coords = (self.get_keyword("RA", 0.1), self.get_keyword("DEC", 0.1))
             if not motion:
                 azcam.log("Telescope reports it is STOPPED")
-                azcam.log("Coords:", self.get_keyword("RA"), self.get_keyword("DEC"))
+                azcam.log("Coords:", *coords)
                 return
             else:
-                azcam.log("Coords:", self.get_keyword("RA"), self.get_keyword("DEC"))
+                azcam.log("Coords:", *coords)
 
             time.sleep(0.1)
             cycle += 1  # not used for now
 
         # stop the telescope
         azcam.log("Telescope motion TIMEOUT - sending CANCEL")
-        command = "CANCEL"
-        command = self.Tserver.make_packet(command)
-        reply = self.Tserver.command(command, 1024)
+        self.cancel_move()
 
         raise azcam.exceptions.AzcamError("STOPPED motion flag not detected")
 
+    def cancel_move(self):
+        """
+        Stop telescope motion by sending CANCEL.
+        """
+
+        command = self.Tserver.make_packet("CANCEL")
+        reply = self.Tserver.command(command, 1024)
+
+        return reply
+
+    # **************************************************************************************************
+    # asyncio motion
+    # **************************************************************************************************
+
+    async def move_async(self, RA, Dec, Epoch=2000.0):
+        """
+        Start a move to an absolute RA,DEC position and return its MotionHandle.
+        Await the handle for completion, e.g. await (await telescope.move_async(ra, dec)).
+
+        Do not use colons in coordinates.
+        """
+
+        commands = ["EPOCH %s" % Epoch, "NEXTRA %s" % RA, "NEXTDEC %s" % Dec, "MOVNEXT"]
+
+        return await asyncio.to_thread(
+            self.start_motion, commands, "move %s %s" % (RA, Dec)
+        )
+
+    async def offset_async(self, RA, Dec):
+        """
+        Start a telescope offset in arcsecs and return its MotionHandle.
+        """
+
+        commands = ["RADECGUIDE %s %s" % (RA, Dec)]
+
+        return await asyncio.to_thread(
+            self.start_motion, commands, "offset %s %s" % (RA, Dec)
+        )
+
+    def start_motion(self, commands, description=""):
+        """
+        Send motion commands and return a MotionHandle which completes when motion stops.
+        One monitor thread follows the motion for all waiters, the handle is also saved
+        as self.motion so other callers can wait for the same motion.
+        """
+
+        if not self.is_enabled:
+            azcam.exceptions.warning("telescope not enabled")
+            return
+
+        handle = MotionHandle(self, description)
+
+        if self.mock == 1:
+            handle._finish("DONE")
+            return handle
+
+        for command in commands:
+            reply = self.Tserver.command(self.Tserver.make_packet(command), 1024)
+            if reply[0] != "OK":
+                handle._finish("ERROR", reply[1])
+                return handle
+
+        self.motion = handle
+
+        thread = threading.Thread(
+            target=self._monitor_motion, name="motionmonitor", args=[handle]
+        )
+        thread.daemon = True
+        thread.start()
+
+        return handle
+
+    def _monitor_motion(self, handle):
+        """
+        Motion monitor thread, updates handle progress until motion stops.
+        """
+
+        started = 0
+        try:
+            while not handle.done():
+                if self.motion is not handle:
+                    handle._finish("SUPERSEDED")
+                    break
+
+                reply = self.get_telemetry_record(self.motion_period)
+                if reply[0] != "OK":
+                    raise azcam.exceptions.AzcamError(reply[1])
+                record = reply[1]
+                motion = int(record["MOTION"])
+
+                elapsed = time.monotonic() - handle.start_time
+                handle.progress = {
+                    "MOTION": motion,
+                    "RA": record["RA"],
+                    "DEC": record["DEC"],
+                    "elapsed": elapsed,
+                }
+
+                if motion:
+                    started = 1
+                elif started or elapsed > 3.0:
+                    # stopped, or MOTION bit never seen high
+                    handle._finish("DONE")
+                    break
+
+                if elapsed > self.move_timeout:
+                    azcam.log("Telescope motion TIMEOUT - sending CANCEL")
+                    self.cancel_move()
+                    handle._finish("TIMEOUT")
+                    break
+
+                time.sleep(self.motion_period)
+        except Exception as e:
+            handle._finish("ERROR", e)
+
+        return
+
+
+class MotionHandle(object):
+    """
+    Handle for one telescope motion started by BokTCS.start_motion().
+    Completion can be awaited from any event loop or waited for from any thread.
+    status is MOVING, DONE, CANCELLED, SUPERSEDED, TIMEOUT, or ERROR.
+    """
+
+    def __init__(self, telescope, description=""):
+        self.telescope = telescope
+        self.description = description
+        self.start_time = time.monotonic()
+
+        self.status = "MOVING"
+        self.error = None
+
+        # latest MOTION, RA, DEC and elapsed seconds
+        self.progress = {}
+
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters = []  # [loop, future]
+
+    def __await__(self):
+        return self.wait_async().__await__()
+
+    def done(self):
+        """
+        Returns True when the motion has finished.
+        """
+
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the motion finishes or timeout seconds, returns status.
+        """
+
+        self._event.wait(timeout)
+
+        return self.status
+
+    async def wait_async(self):
+        """
+        Wait for the motion to finish without blocking the event loop, returns status.
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._event.is_set():
+                return self.status
+            self._waiters.append([loop, future])
+
+        return await future
+
+    def cancel(self):
+        """
+        Stop the motion by sending CANCEL to the telescope.
+        """
+
+        if self.done():
+            return
+
+        self.telescope.cancel_move()
+        self._finish("CANCELLED")
+
+        return
+
+    def _finish(self, status, error=None):
+        """
+        Set final status and wake all waiters.
+        """
+
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.status = status
+            self.error = error
+            self._event.set()
+            waiters = self._waiters
+            self._waiters = []
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_set_future, future, status)
+
+        return
+
+
+def _set_future(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+class TelemetrySampler(object):
+    """
+    Reads telescope telemetry in a background thread during one exposure.
+    A sample is read when sampling starts, replaced by one read when the shutter opens.
+    Further samples are read at the middle of the integration and when the shutter closes,
+    so the header is ready without reading the telescope after the exposure.
+    samples is a dictionary of "start", "mid" and "end" TelemetryRecords.
+    """
+
+    def __init__(self, telescope):
+        self.telescope = telescope
+
+        self.exposure_time = 0.0
+        self.samples = {}
+        self.sample_times = {}  # time.time() of each sample
+
+        self._started = threading.Event()
+        self._ended = threading.Event()
+        self._done = threading.Event()
+        self._stopped = 0
+        self._thread = None
+
+    def start(self):
+        """
+        Start the sampling thread.
+        """
+
+        self._thread = threading.Thread(target=self._run, name="telemetrysampler")
+        self._thread.daemon = True
+        self._thread.start()
+
+        return
+
+    def stop(self):
+        """
+        Stop sampling, the thread exits after any read in progress.
+        """
+
+        self._stopped = 1
+        self._started.set()
+        self._ended.set()
+
+        return
+
+    def integration_start(self, exposure_time):
+        """
+        Shutter opened for exposure_time seconds.
+        """
+
+        self.exposure_time = float(exposure_time)
+        self._started.set()
+
+        return
+
+    def integration_end(self):
+        """
+        Shutter closed.
+        """
+
+        self._ended.set()
+
+        return
+
+    def get_samples(self, timeout=None):
+        """
+        Wait up to timeout seconds for sampling to finish and return a copy of the samples.
+        """
+
+        self._done.wait(timeout)
+
+        return dict(self.samples)
+
+    def _sample(self, name):
+        """
+        Read one telemetry sample.
+        """
+
+        with tracer.span(f"telemetry {name}"):
+            try:
+                reply = self.telescope.get_telemetry_record()
+            except Exception as e:
+                reply = ["ERROR", e]
+
+        if reply[0] != "OK":
+            azcam.log(f"telescope telemetry {name} sample failed: {reply[1]}", level=2)
+            return
+
+        self.samples[name] = reply[1]
+        self.sample_times[name] = time.time()
+
+        return
+
+    def _run(self):
+        """
+        Sampling thread.
+        """
+
+        try:
+            # prefetch, used for the start if the shutter never opens
+            self._sample("start")
+
+            self._started.wait()
+            if self._stopped:
+                return
+            self._sample("start")
+
+            if self.exposure_time >= self.telescope.sample_min_exposure:
+                if not self._ended.wait(self.exposure_time / 2.0):
+                    self._sample("mid")
+                self._ended.wait()
+                if not self._stopped:
+                    self._sample("end")
+        finally:
+            self._done.set()
+
+        return
+
+
+def effective_airmass(records):
+    """
+    Returns the effective airmass of an exposure from the start, mid and end TelemetryRecords,
+    any of which may be None, using Simpson's rule when all three are available.
+    Returns None if no airmass is available.
+    """
+
+    values = []
+    for record in records:
+        try:
+            values.append(float(record["AIRMASS"]))
+        except (TypeError, ValueError):
+            values.append(None)
+
+    start, mid, end = values
+    if start is not None and mid is not None and end is not None:
+        airmass = (start + 4.0 * mid + end) / 6.0
+    else:
+        values = [value for value in values if value is not None]
+        if not values:
+            return None
+        airmass = sum(values) / len(values)
+
+    return round(airmass, 4)
+
 
 class TelcomServerInterface(object):
     Host = ""
@@ -489,6 +1189,29 @@ class TelcomServerInterface(object):
 
         name = "bok"
 
+        # one packet at a time when shared with the telemetry poller
+        self.lock = threading.Lock()
+
+        self.Timeout = 5.0  # socket timeout in seconds
+
+        # keep the connection open between packets, reconnecting when needed
+        self.persistent = 1
+        self.is_open = 0
+
+        # received data not yet returned as a reply
+        self.rxbuffer = bytearray()
+
+        # one pass decoder for REQUEST ALL telemetry
+        self.decoder = TelemetryDecoder(self)
+
+        # connection statistics and per-command latency counters
+        self.connects = 0
+        self.reconnects = 0
+        self.latency = {}
+
+        # latency histograms, errors and bytes by command type
+        self.metrics = get_device("telescope")
+
         telname = name.lower()
         if telname == "bok":
             self.Host = "10.30.3.42"
@@ -500,6 +1223,14 @@ class TelcomServerInterface(object):
 
         return
 
+    def get_health(self):
+        """
+        Returns the CircuitBreaker which fails fast while the telescope server at the current host
+        and port is unreachable.
+        """
+
+        return get_breaker("telescope", self.Host, self.Port)
+
     def open(self, Host="", Port=-1):
         """
         Opens a connection (socket) to the telescope server.
@@ -511,9 +1242,12 @@ class TelcomServerInterface(object):
             self.Port = Port
 
         self.Socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.Socket.settimeout(5.0)
+        self.Socket.settimeout(self.Timeout)
+        self.rxbuffer.clear()
         try:
             self.Socket.connect((self.Host, self.Port))
+            self.is_open = 1
+            self.connects += 1
             return
         except Exception:
             raise azcam.exceptions.AzcamError("could not open telescope server socket")
@@ -522,6 +1256,8 @@ class TelcomServerInterface(object):
         """
         Closes an open connection (socket) to a telescope server.
         """
+        self.is_open = 0
+        self.rxbuffer.clear()
         try:
             self.Socket.close()
         except Exception:
@@ -530,38 +1266,172 @@ class TelcomServerInterface(object):
     def command(self, command, ReplyLength):
         """
         Sends a command to the telescope server and receives the reply.
-        Opens and closes the socket each time.
+        If persistent is set the connection is reused for the next command, and a reused
+        connection which fails is reopened once before giving up.
+        Otherwise opens and closes the socket each time.
+        While the telescope server is marked unavailable an error is returned immediately.
+        Returns the reply, or ["ERROR", message] if the server could not be reached.
         """
 
-        self.open()
-        self.send(command)
-        reply = self.recv(ReplyLength)
-        self.close()
+        health = self.get_health()
+        if not health.allow():
+            return ["ERROR", health.get_message()]
+
+        t0 = time.perf_counter()
+
+        with self.lock:
+            for attempt in range(2):
+                reused = self.is_open and self.is_alive()
+                if not reused:
+                    self.close()
+                    try:
+                        self.open()
+                    except azcam.exceptions.AzcamError as e:
+                        self._count(command, time.perf_counter() - t0, 1)
+                        health.record(1, e)
+                        return ["ERROR", str(e)]
+
+                try:
+                    self.send(command)
+                    reply = self.recv(ReplyLength)
+                except OSError as inst:
+                    reply = ["ERROR", "telescope server write error: %s" % inst]
+
+                if reply[0] == "OK" or not reused:
+                    break
+
+                # reused connection failed so reconnect
+                self.close()
+                self.reconnects += 1
+                self.metrics.add_reconnect()
+
+            if reply[0] != "OK" or not self.persistent:
+                self.close()
+
+            self._count(command, time.perf_counter() - t0, reply[0] != "OK")
+            health.record(reply[0] != "OK", reply[-1])
 
         return reply
 
+    def is_alive(self):
+        """
+        Returns True if the open connection has not been closed by the server.
+        """
+
+        try:
+            readable = select.select([self.Socket], [], [], 0)[0]
+            if readable and self.Socket.recv(1, socket.MSG_PEEK) == b"":
+                return False
+        except (OSError, ValueError):
+            return False
+
+        return True
+
     def send(self, command):
         """
         Sends a command to a socket telescope.
         Appends CRLF to command.
         """
 
-        self.Socket.send(str.encode(command + "\r\n"))  # send command with terminator
+        data = str.encode(command + "\r\n")
+        self.Socket.sendall(data)  # send command with terminator
+        self.metrics.add_bytes(sent=len(data))
 
     def recv(self, Length):
         """
         Receives a reply from a socket telescope.
+        Reads until a newline is received or Length bytes are received.
+        A reply without newline closes the connection so no partial data is left behind.
         """
 
         try:
-            msg = self.Socket.recv(Length)
+            deadline = time.monotonic() + self.Timeout
+            start = 0
+            while True:
+                index = self.rxbuffer.find(b"\n", start)
+                if index >= 0:
+                    end = index + 1
+                    break
+                if len(self.rxbuffer) >= Length:
+                    end = Length
+                    break
+                start = len(self.rxbuffer)
+
+                if time.monotonic() > deadline:
+                    raise socket.timeout("timed out")
+                chunk = self.Socket.recv(4096)
+                if chunk == b"":
+                    raise ConnectionError("connection closed by server")
+                self.rxbuffer += chunk
+                self.metrics.add_bytes(received=len(chunk))
+
+            msg = bytes(self.rxbuffer[:end])
+            del self.rxbuffer[:end]
+            if msg[-1] != 10:
+                self.close()
+
             if msg[-2] == 255:  # funny \xff\n at end of REQUEST ALL data
                 msg = msg[:-2]
             msg = msg.decode()
             return ["OK", msg]
         except Exception as inst:
+            self.close()
             return ["ERROR", "telescope server read error: %s" % inst]
 
+    def _count(self, command, seconds, error):
+        """
+        Add one command to the latency counters.
+        """
+
+        # command type is the packet text after the IDs, REQUEST keeps its keyword
+        words = command.split(" ")[3:]
+        if words[:1] == ["REQUEST"]:
+            ctype = " ".join(words[:2])
+        else:
+            ctype = words[0] if words else ""
+
+        counter = self.latency.get(ctype)
+        if counter is None:
+            counter = self.latency[ctype] = {
+                "count": 0,
+                "errors": 0,
+                "total": 0.0,
+                "max": 0.0,
+            }
+        counter["count"] += 1
+        counter["errors"] += int(error)
+        counter["total"] += seconds
+        counter["max"] = max(counter["max"], seconds)
+
+        self.metrics.record(ctype, seconds, error)
+
+        return
+
+    def get_stats(self):
+        """
+        Returns a dictionary of connection statistics and per-command latency counters.
+        Latency times are in seconds.
+        """
+
+        stats = {"connects": self.connects, "reconnects": self.reconnects}
+        for ctype, counter in self.latency.items():
+            counter = dict(counter)
+            counter["mean"] = counter["total"] / counter["count"]
+            stats[ctype] = counter
+
+        return stats
+
+    def reset_stats(self):
+        """
+        Reset connection statistics and latency counters.
+        """
+
+        self.connects = 0
+        self.reconnects = 0
+        self.latency = {}
+
+        return
+
     def make_packet(self, command):
         """
         Internal Use Only.<br>
@@ -626,3 +1496,107 @@ class TelcomServerInterface(object):
                 break
 
         return List
+
+
+class TelemetryRecord(object):
+    """
+    One decoded REQUEST ALL telemetry record.
+    Values are stored in the keyword order of the TelemetryDecoder which made it.
+    Example: record["RA"]
+    """
+
+    __slots__ = ("decoder", "values", "errors")
+
+    def __init__(self, decoder, values, errors):
+        self.decoder = decoder
+        self.values = values
+        self.errors = errors
+
+    def __getitem__(self, keyword):
+        return self.values[self.decoder.index[keyword]]
+
+    def __contains__(self, keyword):
+        return keyword in self.decoder.index
+
+    def get(self, keyword, default=None):
+        try:
+            return self.values[self.decoder.index[keyword]]
+        except KeyError:
+            return default
+
+    def as_dict(self):
+        """
+        Returns the record as a dictionary of keyword values.
+        """
+
+        return dict(zip(self.decoder.keywords, self.values))
+
+
+class TelemetryDecoder(object):
+    """
+    Decodes a REQUEST ALL telemetry string in one pass.
+    The slices and type conversions are compiled once from the Offsets, ReplyLengths and
+    typestrings tables of a TelcomServerInterface. Keywords sharing a field, such as
+    LST-OBS and ST, are decoded once.
+    """
+
+    def __init__(self, tserver):
+        self.keywords = sorted(tserver.Offsets)
+        self.index = {key: i for i, key in enumerate(self.keywords)}
+
+        # unique fields as [start, stop, converter, [value indices]]
+        fields = {}
+        for i, keyword in enumerate(self.keywords):
+            start = tserver.Offsets[keyword] - 1
+            stop = tserver.Offsets[keyword] + tserver.ReplyLengths[keyword]
+            converter = self._converter(keyword, tserver.typestrings[keyword])
+            fields.setdefault((start, stop, converter), []).append(i)
+        self.fields = [
+            (start, stop, converter, indices)
+            for (start, stop, converter), indices in fields.items()
+        ]
+
+    @staticmethod
+    def _converter(keyword, typestring):
+        """
+        Returns the function which converts a field string to its value.
+        """
+
+        if keyword == "RA":
+            return _format_ra
+        elif keyword == "DEC":
+            return _format_dec
+        elif typestring == int:
+            return int
+        elif typestring == float:
+            return float
+
+        return str
+
+    def decode(self, telemetry):
+        """
+        Returns a TelemetryRecord from a telemetry string with the header stripped.
+        Values which cannot be converted are "" and listed in record.errors.
+        """
+
+        values = [None] * len(self.keywords)
+        errors = []
+        for start, stop, converter, indices in self.fields:
+            try:
+                value = converter(telemetry[start:stop])
+            except Exception as message:
+                value = ""
+                for i in indices:
+                    errors.append([self.keywords[i], message])
+            for i in indices:
+                values[i] = value
+
+        return TelemetryRecord(self, values, errors)
+
+
+def _format_ra(reply):
+    return "%s:%s:%s" % (reply[0:2], reply[2:4], reply[4:])
+
+
+def _format_dec(reply):
+    return "%s:%s:%s" % (reply[0:3], reply[3:5], reply[5:])
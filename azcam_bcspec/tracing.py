@@ -0,0 +1,220 @@
+# Contains the Tracer class which records exposure timeline spans.
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+class Tracer(object):
+    """
+    Records timed spans during an exposure and writes them when the exposure finishes.
+    Each exposure is appended to trace_file as a compact text block, and the last
+    max_exposures exposures are written to chrome_file in Chrome trace format
+    (open with chrome://tracing or https://ui.perfetto.dev).
+    """
+
+    def __init__(self):
+        # spans are only recorded when enabled
+        self.enabled = 1
+
+        # output files, None to not write
+        self.trace_file = None
+        self.chrome_file = None
+        self.max_exposures = 50
+
+        # current exposure label and spans as [name, thread, start, end, args]
+        self.label = ""
+        self.t0 = None
+        self.spans = []
+        self.open_spans = {}
+
+        # spans of previous exposures for the Chrome trace
+        self.history = []
+
+        self.lock = threading.Lock()
+
+    def start(self, label=""):
+        """
+        Start recording spans for a new exposure.
+        """
+
+        with self.lock:
+            self.label = label
+            self.t0 = time.perf_counter()
+            self.spans = []
+            self.open_spans = {}
+
+        self.begin("exposure")
+
+        return
+
+    def finish(self):
+        """
+        Stop recording and write the exposure's spans.
+        Spans still open are ended now.
+        """
+
+        if self.t0 is None:
+            return
+
+        for name in list(self.open_spans):
+            self.end(name)
+
+        with self.lock:
+            spans = self.spans
+            label = self.label
+            t0 = self.t0
+            self.spans = []
+            self.t0 = None
+
+            self.history.append([label, t0, spans])
+            del self.history[: -self.max_exposures]
+
+        if self.trace_file is not None:
+            self.write_trace(self.trace_file, label, t0, spans)
+        if self.chrome_file is not None:
+            self.write_chrome(self.chrome_file)
+
+        return
+
+    def add(self, name, start, end, args=None):
+        """
+        Add a span with perf_counter start and end times.
+        """
+
+        if self.t0 is None or not self.enabled:
+            return
+
+        self.spans.append([name, threading.current_thread().name, start, end, args])
+
+        return
+
+    def begin(self, name, args=None):
+        """
+        Begin a span which is ended by end(name), possibly from another call.
+        """
+
+        if self.t0 is None or not self.enabled:
+            return
+
+        self.open_spans[name] = [time.perf_counter(), args]
+
+        return
+
+    def end(self, name):
+        """
+        End a span started by begin(name).
+        """
+
+        span = self.open_spans.pop(name, None)
+        if span is not None:
+            self.add(name, span[0], time.perf_counter(), span[1])
+
+        return
+
+    @contextlib.contextmanager
+    def span(self, name, args=None):
+        """
+        Context manager which records a span.
+        """
+
+        if self.t0 is None or not self.enabled:
+            yield
+            return
+
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, t0, time.perf_counter(), args)
+
+    def wrap(self, function, name):
+        """
+        Returns function wrapped so that each call is recorded as a span.
+        """
+
+        @functools.wraps(function)
+        def traced(*args, **kwargs):
+            with self.span(name):
+                return function(*args, **kwargs)
+
+        return traced
+
+    def write_trace(self, filename, label, t0, spans):
+        """
+        Append one exposure to a compact trace file.
+        Each span is one line of start and duration in ms from exposure start, thread, name.
+        """
+
+        lines = [
+            "# %s %s\n"
+            % (time.strftime("%Y-%m-%dT%H:%M:%S"), label if label else "exposure")
+        ]
+        for name, thread, start, end, args in sorted(spans, key=lambda s: s[2]):
+            line = "%10.1f %10.1f %-12s %s" % (
+                (start - t0) * 1e3,
+                (end - start) * 1e3,
+                thread,
+                name,
+            )
+            if args:
+                line += " " + json.dumps(args)
+            lines.append(line + "\n")
+
+        with open(filename, "a") as f1:
+            f1.writelines(lines)
+
+        return
+
+    def write_chrome(self, filename):
+        """
+        Write recent exposures in Chrome trace format.
+        """
+
+        with self.lock:
+            history = list(self.history)
+
+        if not history:
+            return
+
+        origin = history[0][1]
+        threads = {}
+        events = []
+        for label, t0, spans in history:
+            for name, thread, start, end, args in spans:
+                tid = threads.setdefault(thread, len(threads) + 1)
+                event = {
+                    "name": name,
+                    "cat": label if label else "exposure",
+                    "ph": "X",
+                    "ts": round((start - origin) * 1e6),
+                    "dur": round((end - start) * 1e6),
+                    "pid": os.getpid(),
+                    "tid": tid,
+                }
+                if args:
+                    event["args"] = args
+                events.append(event)
+
+        for thread, tid in threads.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": tid,
+                    "args": {"name": thread},
+                }
+            )
+
+        with open(filename, "w") as f1:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f1)
+
+        return
+
+
+# exposure timeline tracer
+tracer = Tracer()
@@ -0,0 +1,213 @@
+"""
+Fixtures for the bcspec performance suite.
+Device clients run against in-process simulators and latency is checked against JSON baselines
+in tests/baselines. Run "pytest --save-baselines" to record new baselines on a reference machine.
+Baselines are wall-clock times, so they are only checked on the machine and Python version
+which recorded them.
+"""
+
+import json
+import os
+import platform
+
+import pytest
+
+from azcam_bcspec.benchmarks import percentiles
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bcspec baselines")
+    group.addoption(
+        "--save-baselines",
+        action="store_true",
+        default=False,
+        help="save p50/p99 latency of each benchmark as its new baseline",
+    )
+    group.addoption(
+        "--baseline-p50",
+        type=float,
+        default=2.0,
+        help="fail if p50 latency exceeds this multiple of its baseline",
+    )
+    group.addoption(
+        "--baseline-p99",
+        type=float,
+        default=4.0,
+        help="fail if p99 latency exceeds this multiple of its baseline",
+    )
+    group.addoption(
+        "--baseline-any-machine",
+        action="store_true",
+        default=False,
+        help="check baselines recorded on another machine or Python version",
+    )
+
+
+def get_machine():
+    """
+    Returns the id of this machine saved with each baseline.
+    """
+
+    return f"{platform.node()} {platform.machine()} {os.cpu_count()} cpus"
+
+
+@pytest.fixture(scope="session")
+def server():
+    from azcam.server import setup_server
+
+    setup_server()
+
+    return
+
+
+@pytest.fixture(scope="session")
+def opto22_sim():
+    from azcam_bcspec.simulators.opto22 import Opto22Simulator
+
+    sim = Opto22Simulator()
+    sim.start()
+    yield sim
+    sim.stop()
+
+
+@pytest.fixture(scope="session")
+def tcs_sim():
+    from azcam_bcspec.simulators.tcs import BokTCSSimulator
+
+    sim = BokTCSSimulator()
+    sim.min_slew_time = 0.3
+    sim.start()
+    yield sim
+    sim.stop()
+
+
+@pytest.fixture(scope="session")
+def bokpop_sim():
+    from azcam_bcspec.simulators.bokpop import BokpopSimulator
+
+    sim = BokpopSimulator(stations=10, depth=3, seed=1)
+    sim.start()
+    yield sim
+    sim.stop()
+
+
+@pytest.fixture(scope="session")
+def instrument(server, opto22_sim):
+    from azcam_bcspec.instrument_bcspec import BCSpecInstrument
+
+    instrument = BCSpecInstrument()
+    instrument.Iserver.Host = opto22_sim.host
+    instrument.Iserver.Port = opto22_sim.port
+    instrument.initialize()
+
+    return instrument
+
+
+@pytest.fixture(scope="session")
+def telescope(server, tcs_sim):
+    from azcam_bcspec.telescope_bok import BokTCS
+
+    telescope = BokTCS()
+    telescope.initialize()
+    telescope.Tserver.Host = tcs_sim.host
+    telescope.Tserver.Port = tcs_sim.port
+
+    return telescope
+
+
+@pytest.fixture
+def exposure(server):
+    """
+    ExposureBCSpec with a controller which only accepts the calls made by Exposure.begin().
+    """
+
+    import azcam
+    from azcam.tools.tools import Tools
+
+    from azcam_bcspec.exposure_bcspec import ExposureBCSpec
+
+    class StubController(Tools):
+        def __init__(self):
+            super().__init__("controller", "stub controller")
+            self.is_reset = 1
+
+        def set_shutter_state(self, state):
+            return
+
+        def set_exposuretime(self, exposure_time):
+            return
+
+        def stop_idle(self):
+            return
+
+    StubController()
+    exposure = ExposureBCSpec()
+    exposure.flush_array = 0
+
+    yield exposure
+
+    for name in ["controller", "exposure"]:
+        for tools in [azcam.db.tools, azcam.db.cli, azcam.db.headers]:
+            tools.pop(name, None)
+
+
+@pytest.fixture
+def check_baseline(request):
+    """
+    Returns a function which compares a finished benchmark's p50/p99 with its baseline.
+    """
+
+    config = request.config
+    name = request.module.__name__.split(".")[-1] + "." + request.node.name
+    filename = os.path.join(BASELINES, name + ".json")
+
+    def check(benchmark):
+        if benchmark.stats is None:  # --benchmark-disable
+            return
+
+        times = benchmark.stats.stats.data
+        p50, p99 = percentiles(times)
+
+        if config.getoption("--save-baselines"):
+            os.makedirs(BASELINES, exist_ok=True)
+            baseline = {
+                "p50": p50,
+                "p99": p99,
+                "rounds": len(times),
+                "machine": get_machine(),
+                "python": platform.python_version(),
+            }
+            with open(filename, "w") as f1:
+                json.dump(baseline, f1, indent=2)
+                f1.write("\n")
+            return
+
+        if not os.path.exists(filename):
+            return
+
+        with open(filename) as f1:
+            baseline = json.load(f1)
+
+        # times from another machine are not comparable
+        same = baseline.get("machine") == get_machine() and baseline.get(
+            "python"
+        ) == platform.python_version()
+        if not same and not config.getoption("--baseline-any-machine"):
+            return
+
+        p50_limit = baseline["p50"] * config.getoption("--baseline-p50")
+        p99_limit = baseline["p99"] * config.getoption("--baseline-p99")
+        assert p50 <= p50_limit, (
+            f"p50 {p50 * 1e3:.3f} ms exceeds {p50_limit * 1e3:.3f} ms "
+            f"(baseline {baseline['p50'] * 1e3:.3f} ms)"
+        )
+        assert p99 <= p99_limit, (
+            f"p99 {p99 * 1e3:.3f} ms exceeds {p99_limit * 1e3:.3f} ms "
+            f"(baseline {baseline['p99'] * 1e3:.3f} ms)"
+        )
+
+        return
+
+    return check
@@ -0,0 +1,36 @@
+"""
+Benchmarks for BokData header builds against the bokpop simulator.
+"""
+
+from azcam_bcspec.instrument_bcspec import BokData
+from azcam_bcspec.simulators.bokpop import make_payload
+
+
+def test_make_header(benchmark, check_baseline, bokpop_sim):
+    bokdata = BokData(bokpop_sim.host, bokpop_sim.port, 1.0)
+
+    header = benchmark(bokdata.makeHeader)
+
+    # the simulator sends the same seeded payload for each request
+    assert header == bokdata.headerFromData(make_payload(10, 3, seed=1))
+    assert len(header) == len(bokdata.kwmap) + 1
+    assert bokdata.fileno() == -1  # socket closed after each fetch
+    check_baseline(benchmark)
+
+
+def test_header_from_data(benchmark, check_baseline):
+    bokdata = BokData()
+    bokdata.close()
+    payload = make_payload(stations=200, depth=3, seed=1)
+
+    header = benchmark(bokdata.headerFromData, payload)
+
+    assert len(header) == len(bokdata.kwmap) + 1
+    values = {item[0]: item[1] for item in header}
+    for kw, fitskw, comment, converter in bokdata.header_plan:
+        value = bokdata.extract(payload, kw)
+        if converter is not None and value is not None:
+            value = converter(value)
+        assert values[fitskw] == value
+    assert values["ST"] == values["LST-OBS"]
+    check_baseline(benchmark)
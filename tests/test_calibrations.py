@@ -0,0 +1,65 @@
+"""
+Tests for CalibrationSequence with a simulated exposure and the Opto22 simulator.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def calibrations(server, instrument):
+    import azcam
+
+    from azcam_bcspec.benchmarks.calibrations import SimulatedExposure
+    from azcam_bcspec.calibrations import CalibrationSequence
+
+    exposure = SimulatedExposure(0.0)
+    calibrations = CalibrationSequence()
+
+    yield calibrations
+
+    for name in ["exposure", "calibrations"]:
+        for tools in [azcam.db.tools, azcam.db.cli]:
+            tools.pop(name, None)
+    instrument.lamps_off_all()
+
+
+@pytest.mark.parametrize("pipeline", [0, 1])
+def test_run(calibrations, instrument, opto22_sim, monkeypatch, pipeline):
+    calibrations.pipeline = pipeline
+    monkeypatch.setattr(instrument, "DefaultWarmup", 0.0)
+    monkeypatch.setattr(instrument, "LampWarmups", {"FE/NE": 0.0})
+
+    report = calibrations.run([["HE/AR/NE", 1.0, 2], ["flat", 1.0, 1, "CONT"]])
+
+    assert report["frames"] == 3
+    assert [frame[1] for frame in calibrations.frames] == [
+        ["HE/AR", "NEON"],
+        ["HE/AR", "NEON"],
+        ["CONT"],
+    ]
+    assert opto22_sim.get_lamps_on() == []
+
+
+def test_run_error(calibrations, instrument, monkeypatch):
+    import azcam
+
+    exposure = azcam.db.tools["exposure"]
+    after_integrate = exposure.after_integrate
+
+    def expose(*args):
+        raise RuntimeError("readout failed")
+
+    def lamp_transaction(Operations):
+        if all(state == 0 for lamp, state in Operations):
+            raise OSError("lamp server down")
+        return []
+
+    monkeypatch.setattr(exposure, "expose", expose)
+    monkeypatch.setattr(instrument, "lamp_transaction", lamp_transaction)
+
+    # the exposure error is raised, not the lamp error from turning lamps off
+    with pytest.raises(RuntimeError, match="readout failed"):
+        calibrations.run([["HE/AR/NE", 1.0, 2]])
+
+    assert exposure.comp_sequence == 0
+    assert exposure.after_integrate is after_integrate
@@ -0,0 +1,102 @@
+"""
+Tests for ExposureBCSpec with the instrument and telescope against the simulators.
+"""
+
+
+def test_begin_comps_warmup(exposure, instrument, opto22_sim, monkeypatch):
+    delays = []
+
+    def comps_delay(DelayTime=0):
+        delays.append(instrument.get_warmup_remaining(DelayTime))
+
+    monkeypatch.setattr(instrument, "comps_delay", comps_delay)
+    instrument.lamps_off_all()
+
+    # Exposure.begin() sets comps from the lowercase imagetype
+    try:
+        exposure.begin(1.0, "FE/NE")
+
+        assert instrument.get_active_comps() == ["FE/NE"]
+        assert opto22_sim.get_lamps_on() == ["FE/NE"]
+        assert exposure.get_keyword("COMPLAMP")[0] == "FE/NE"
+        assert delays[0] > instrument.DefaultWarmup
+        assert delays[0] <= instrument.LampWarmups["FE/NE"]
+    finally:
+        instrument.lamps_off_all()
+
+
+def test_update_headers_failing_tool(exposure):
+    import azcam
+    from azcam.header import Header, ObjectHeaderMethods
+    from azcam.tools.tools import Tools
+
+    class FailingTool(Tools, ObjectHeaderMethods):
+        def __init__(self):
+            super().__init__("failing", "failing tool")
+            self.header = Header("Failing")
+            self.header.set_header("failing")
+            self.is_initialized = 1
+            self.fail = 0
+
+        def define_keywords(self):
+            if self.fail:
+                raise AttributeError("no server")
+            self.header.set_keyword("FAILKEY", 7, "failing tool keyword", "int")
+
+    tool = FailingTool()
+    try:
+        exposure.update_headers()
+        assert tool.header.get_keyword("FAILKEY")[:2] == [7, "failing tool keyword"]
+        assert "HDRSTALE" not in exposure.header.get_keywords()
+
+        # a tool which raises uses its last values, marked stale for this image only
+        tool.fail = 1
+        exposure.update_headers()
+        assert exposure.header_times["failing"] is not None
+        assert tool.header.get_keyword("FAILKEY")[:2] == [
+            7,
+            "failing tool keyword (stale)",
+        ]
+        assert exposure.get_keyword("HDRSTALE")[0] == "failing"
+
+        tool.fail = 0
+        exposure.update_headers()
+        assert tool.header.get_keyword("FAILKEY")[:2] == [7, "failing tool keyword"]
+        assert exposure.header_cache["failing"][0][2] == "failing tool keyword"
+        assert "HDRSTALE" not in exposure.header.get_keywords()
+    finally:
+        for tools in [azcam.db.tools, azcam.db.cli, azcam.db.headers]:
+            tools.pop("failing", None)
+        azcam.db.headerorder.remove("failing")
+
+
+def test_end_clears_stale_telescope(exposure, telescope, monkeypatch):
+    from azcam.tools.arc.exposure_arc import ExposureArc
+
+    get_header_data = telescope.get_header_data
+    failing = [0]
+
+    def read(max_age=None):
+        if failing[0]:
+            raise OSError("telescope timeout")
+        return get_header_data(max_age)
+
+    monkeypatch.setattr(telescope, "get_header_data", read)
+    monkeypatch.setattr(
+        telescope, "update_exposure_header", lambda timeout=None: telescope.read_header()
+    )
+    monkeypatch.setattr(ExposureArc, "end", lambda self: None)
+
+    exposure.update_headers()
+    failing[0] = 1
+    exposure.update_headers()
+    assert exposure.get_keyword("HDRSTALE")[0] == "telescope"
+    assert telescope.header.comments["RA"].endswith("(stale)")
+
+    # header from integration samples replaces the stale values
+    failing[0] = 0
+    exposure.end()
+
+    assert "HDRSTALE" not in exposure.header.get_keywords()
+    assert not telescope.header.comments["RA"].endswith("(stale)")
+    assert exposure.header_stale == []
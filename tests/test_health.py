@@ -0,0 +1,67 @@
+"""
+Tests for the device host circuit breakers.
+"""
+
+import socket
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_breaker_transitions(server, tcs_sim):
+    from azcam_bcspec.health import CircuitBreaker
+
+    breaker = CircuitBreaker("test", tcs_sim.host, tcs_sim.port, max_failures=2)
+    breaker.backoff = breaker.current_backoff = 0.0
+
+    breaker.record(1, "timeout")
+    assert breaker.state == "closed"
+    breaker.record(1, "timeout")
+    assert breaker.state == "open"
+    assert breaker.as_dict()["opens"] == 1
+
+    # the probe connects to the simulator
+    assert breaker.probe()
+    assert breaker.state == "half-open"
+
+    breaker.record(1, "timeout")
+    assert breaker.state == "open"
+
+    assert breaker.probe()
+    breaker.record(0)
+    assert breaker.state == "closed"
+    assert breaker.consecutive_failures == 0
+
+
+def test_breakers_by_host(server):
+    from azcam_bcspec.health import get_breaker, get_health
+
+    port = free_port()
+    breaker = get_breaker("telescope", "127.0.0.1", port)
+
+    assert get_breaker("telescope", "127.0.0.1", port) is breaker
+    assert get_breaker("telescope", "10.30.3.42", 5750) is not breaker
+    assert get_health("telescope")[f"telescope 127.0.0.1:{port}"]["port"] == port
+
+
+def test_telescope_unreachable(server):
+    from azcam_bcspec.health import get_breaker
+    from azcam_bcspec.telescope_bok import TelcomServerInterface
+
+    tserver = TelcomServerInterface()
+    tserver.Host = "127.0.0.1"
+    tserver.Port = free_port()
+    tserver.Timeout = 0.5
+    production = get_breaker("telescope", "10.30.3.42", 5750)
+
+    # errors are returned, not raised, whether the breaker is closed or open
+    command = tserver.make_packet("REQUEST RA")
+    replies = [tserver.command(command, 30) for _ in range(4)]
+
+    assert [reply[0] for reply in replies] == ["ERROR"] * 4
+    assert "unavailable" in replies[-1][1]
+    assert tserver.get_health().state == "open"
+    assert production.state == "closed"
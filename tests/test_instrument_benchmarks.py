@@ -0,0 +1,143 @@
+"""
+Benchmarks for InstrumentServerInterface and BCSpecInstrument against the Opto22 simulator.
+"""
+
+from azcam_bcspec.instrument_bcspec import InstrumentServerInterface
+
+
+def test_transaction(benchmark, check_baseline, opto22_sim):
+    iserver = InstrumentServerInterface(opto22_sim.host, opto22_sim.port, "opto22")
+
+    with iserver.session():
+        reply = benchmark(iserver.transaction, "ONLAMP NEON")
+
+    assert reply == ["OK", "OK: ONLAMP NEON"]
+    check_baseline(benchmark)
+
+
+def test_transaction_per_connection(benchmark, check_baseline, opto22_sim):
+    iserver = InstrumentServerInterface(opto22_sim.host, opto22_sim.port, "opto22")
+
+    reply = benchmark(iserver.transaction, "OFFLAMP NEON")
+
+    assert reply == ["OK", "OK: OFFLAMP NEON"]
+    check_baseline(benchmark)
+
+
+def test_comps_sequence(benchmark, check_baseline, instrument, opto22_sim):
+    instrument.set_active_comps(["HE/AR/NE", "FE/NE"])
+
+    def sequence():
+        instrument.comps_on()
+        instrument.comps_off()
+
+    benchmark(sequence)
+
+    assert opto22_sim.get_lamps_on() == []
+    states = instrument.get_lamp_states()
+    assert [states[lamp][0] for lamp in ["HE/AR", "NEON", "FE/NE"]] == ["off"] * 3
+    assert opto22_sim.history[-3:] == ["OFFLAMP HE/AR", "OFFLAMP NEON", "OFFLAMP FE/NE"]
+    check_baseline(benchmark)
+
+
+def test_lamps_off_all(benchmark, check_baseline, instrument, opto22_sim):
+    benchmark(instrument.lamps_off_all)
+
+    assert opto22_sim.get_lamps_on() == []
+    check_baseline(benchmark)
+
+
+def test_lamps_off_all_untracked(instrument, opto22_sim):
+    instrument.lamps_off_all()
+
+    # lamp turned on at the panel while tracked as off
+    with opto22_sim.lock:
+        opto22_sim.lamps["NEON"] = 1
+    assert instrument.get_lamp_states()["NEON"][0] == "off"
+
+    instrument.lamps_off_all()
+
+    assert opto22_sim.get_lamps_on() == []
+
+
+def test_read_header(benchmark, check_baseline, instrument):
+    from azcam_bcspec.instrument_bcspec import BokData
+    from azcam_bcspec.simulators.bokpop import make_payload
+
+    # the bokpop keywords which make up the instrument header
+    bokdata = BokData()
+    bokdata.close()  # no connection needed
+    bokpopdata = bokdata.headerFromData(make_payload(10, 3, seed=1))
+    instrument.header.delete_all_keywords()
+    instrument.set_bokpop_header(bokpopdata)
+
+    def clear_cache():
+        instrument.header_cache = None
+
+    try:
+        header = benchmark.pedantic(
+            instrument.read_header, setup=clear_cache, rounds=2000, warmup_rounds=10
+        )
+        values = {item[0]: [item[1], item[2], item[3]] for item in header}
+        assert len(values) == len(bokpopdata) == 29
+        for keyword, value, comment in bokpopdata:
+            assert values[keyword] == [str(value), comment, "str"]
+    finally:
+        instrument.header.delete_all_keywords()
+
+    check_baseline(benchmark)
+
+
+def test_read_header_bulk(benchmark, check_baseline, instrument):
+    from azcam_bcspec.benchmarks.instrument_header import fill_header, legacy_header
+
+    fill_header(instrument, 60)
+    counter = [0]
+
+    def changed():
+        counter[0] += 1
+        instrument.header.set_keyword("INST0000", counter[0])
+        return instrument.read_header()
+
+    try:
+        header = benchmark(changed)
+        assert header == legacy_header(instrument)
+    finally:
+        instrument.header.delete_all_keywords()
+
+    check_baseline(benchmark)
+
+
+def test_read_header_cached(benchmark, check_baseline, instrument):
+    from azcam_bcspec.benchmarks.instrument_header import fill_header, legacy_header
+
+    fill_header(instrument, 60)
+
+    try:
+        header = benchmark(instrument.read_header)
+        assert header == legacy_header(instrument)
+    finally:
+        instrument.header.delete_all_keywords()
+
+    check_baseline(benchmark)
+
+
+def test_initialize_lamp_states(instrument, opto22_sim, monkeypatch):
+    instrument.initialize()
+
+    assert opto22_sim.initialized == 1
+    assert {state for state, seconds in instrument.get_lamp_states().values()} == {
+        "off"
+    }
+
+    # a reply which does not confirm INITOPTO leaves lamp states unknown
+    monkeypatch.setattr(
+        instrument.Iserver, "transaction", lambda Command: ["OK", opto22_sim.banner]
+    )
+    instrument.initialize()
+
+    assert {state for state, seconds in instrument.get_lamp_states().values()} == {
+        "unknown"
+    }
+    monkeypatch.undo()
+    instrument.initialize()
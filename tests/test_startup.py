@@ -0,0 +1,56 @@
+"""
+Tests for connecting to a server at startup.
+"""
+
+import socket
+import time
+
+from azcam_bcspec.startup import connect_server, server_listening
+
+
+def test_connect_server(server):
+    listener = socket.create_server(("127.0.0.1", 0))
+    host, port = listener.getsockname()[:2]
+    calls = []
+
+    def connect():
+        calls.append(1)
+        return True
+
+    try:
+        assert server_listening(host, port, 1.0) == ""
+        assert connect_server(connect, host, port)
+        assert len(calls) == 1
+    finally:
+        listener.close()
+
+
+def test_connect_server_retry(server, monkeypatch):
+    # a port nothing listens on, then a server which comes up later
+    listener = socket.create_server(("127.0.0.1", 0))
+    host, port = listener.getsockname()[:2]
+    listener.close()
+
+    messages = []
+    monkeypatch.setattr(
+        "azcam.log", lambda message, *args, **kwargs: messages.append(message)
+    )
+    calls = []
+
+    def connect():
+        calls.append(1)
+        return True
+
+    assert server_listening(host, port, 1.0) != ""
+    assert not connect_server(connect, host, port, retry=0.1, retries=50)
+    assert f"{host}:{port}" in messages[0]
+    assert calls == []
+
+    listener = socket.create_server((host, port))
+    try:
+        t0 = time.monotonic()
+        while not calls and time.monotonic() - t0 < 5.0:
+            time.sleep(0.05)
+        assert calls == [1]
+    finally:
+        listener.close()
@@ -0,0 +1,41 @@
+"""
+Benchmarks for TelcomServerInterface and BokTCS against the Bok TCS simulator.
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize("persistent", [0, 1])
+def test_read_header(benchmark, check_baseline, telescope, tcs_sim, persistent):
+    telescope.Tserver.persistent = persistent
+
+    header = benchmark(telescope.read_header)
+
+    values = {item[0]: item[1] for item in header}
+    ra = tcs_sim.telemetry()["RA"]
+    assert values["RA"].strip() == f"{ra[0:2]}:{ra[2:4]}:{ra[4:]}"
+    assert telescope.header.values["RA"] == values["RA"].strip()
+    check_baseline(benchmark)
+
+
+@pytest.mark.parametrize("persistent", [0, 1])
+def test_get_keyword(benchmark, check_baseline, telescope, persistent):
+    telescope.Tserver.persistent = persistent
+
+    reply = benchmark(telescope.get_keyword, "RA")
+
+    assert reply[0].startswith("12:")
+    check_baseline(benchmark)
+
+
+def test_wait_for_move(benchmark, check_baseline, telescope, tcs_sim):
+    telescope.Tserver.persistent = 1
+    targets = iter(["120000.00", "120030.00"] * 10)
+
+    def move():
+        telescope.move(next(targets), "+300000.0")
+
+    benchmark.pedantic(move, rounds=6, iterations=1)
+
+    assert tcs_sim.slew is None
+    check_baseline(benchmark)